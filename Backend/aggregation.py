@@ -0,0 +1,126 @@
+"""
+Single-pass statistics over processed weather days.
+One ClimateAggregate holds mean/min/max/count for every metric plus per-year
+sub-aggregates, so the insights and enhanced routes walk the historical days
+once and share the result. Aggregates built from separate per-year fetches
+can be merged.
+"""
+
+from operator import attrgetter
+
+# Metric name -> how to read it from a processed day record
+METRICS = {
+    'temperature_avg': attrgetter('temp_avg'),
+    'temperature_max': attrgetter('temp_max'),
+    'temperature_min': attrgetter('temp_min'),
+    'precipitation': attrgetter('precipitation'),
+    'humidity': attrgetter('humidity'),
+    'wind_speed': attrgetter('wind_speed'),
+    'solar_radiation': attrgetter('solar_radiation'),
+}
+
+
+class MetricAggregate:
+    """Running count/sum/min/max for one metric"""
+    __slots__ = ('count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        if value is None:
+            return
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        if not other.count:
+            return
+        self.count += other.count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def to_dict(self):
+        return {'mean': self.mean, 'min': self.min, 'max': self.max, 'count': self.count}
+
+
+class ClimateAggregate:
+    """Statistics for every metric over a set of days, with per-year breakdown"""
+
+    def __init__(self):
+        self.days = 0
+        self.metrics = {name: MetricAggregate() for name in METRICS}
+        self.years = {}
+
+    def add_day(self, day):
+        self.days += 1
+        year = str(day.date)[:4]
+        year_metrics = self.years.get(year)
+        if year_metrics is None:
+            year_metrics = self.years[year] = {name: MetricAggregate() for name in METRICS}
+        for name, read in METRICS.items():
+            value = read(day)
+            self.metrics[name].add(value)
+            year_metrics[name].add(value)
+
+    def add_days(self, days):
+        for day in days or []:
+            self.add_day(day)
+        return self
+
+    def merge(self, other):
+        """Fold another aggregate (e.g. from a separate per-year fetch) into this one"""
+        self.days += other.days
+        for name, metric in other.metrics.items():
+            self.metrics[name].merge(metric)
+        for year, year_metrics in other.years.items():
+            mine = self.years.get(year)
+            if mine is None:
+                mine = self.years[year] = {name: MetricAggregate() for name in METRICS}
+            for name, metric in year_metrics.items():
+                mine[name].merge(metric)
+        return self
+
+    def historical_average(self):
+        """Averages in the shape returned by calculate_historical_average, None without temperatures"""
+        temps = self.metrics['temperature_avg']
+        if not temps.count:
+            return None
+        precipitation = self.metrics['precipitation']
+        humidity = self.metrics['humidity']
+        return {
+            'temperature': {
+                'avg': temps.mean,
+                'max': temps.max,
+                'min': temps.min
+            },
+            'precipitation': precipitation.mean if precipitation.count else 0,
+            'humidity': humidity.mean if humidity.count else 0
+        }
+
+    def to_dict(self):
+        return {
+            'days': self.days,
+            'metrics': {name: metric.to_dict() for name, metric in self.metrics.items()},
+            'years': {
+                year: {name: metric.to_dict() for name, metric in year_metrics.items()}
+                for year, year_metrics in sorted(self.years.items())
+            }
+        }
+
+
+def aggregate_days(days):
+    """Build a ClimateAggregate from processed days in one pass"""
+    return ClimateAggregate().add_days(days)
@@ -1,19 +1,81 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-import requests
+import time
+
+# Time spent importing this module is reported as the first startup phase
+_import_started = time.perf_counter()
+
+import atexit
+from flask import Blueprint, Flask, current_app, request, jsonify
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.local import LocalProxy
 import json
 from datetime import datetime, timedelta
 import os
-from dotenv import load_dotenv
+import sys
+import threading
+from urllib.parse import urlparse
+from compression import ResponseCompressor
+from cache import MemoryCache, SQLiteCache, create_cache
+from upstream import UpstreamScheduler, UpstreamThrottled
+from transport import PassthroughTransport, ReplayMiss, create_transport
+from leader import LeaderLock
+from prefetch import HotLocationTracker, PrefetchScheduler, load_warmup_list
+from aggregation import ClimateAggregate, aggregate_days
+from records import AirQuality, DayRecord, HISTORICAL_AIR_QUALITY, air_quality_for
+from downsample import HOURLY_VARIABLES, HourlySeries
+from startup import SnapshotWriter, StartupReport, restore_snapshot
+
+startup_report = StartupReport()
+
+# requests, flask_cors and dotenv are imported lazily to keep cold starts short
+requests = None
+
+api = Blueprint('api', __name__)
+
+def _app_service(name):
+    # Services are built per app by create_app() and stored in app.extensions
+    return LocalProxy(lambda: current_app.extensions['weather_api'][name])
 
-# Load environment variables
-load_dotenv()
+compressor = _app_service('compressor')
+weather_service = _app_service('weather_service')
+hot_locations = _app_service('hot_locations')
+prefetcher = _app_service('prefetcher')
+snapshot_writer = _app_service('snapshot_writer')
 
-app = Flask(__name__)
-CORS(app)
+def _requests():
+    """Import requests on first use, it is the slowest import at cold start"""
+    global requests
+    if requests is None:
+        with startup_report.phase('import requests (deferred)'):
+            import requests as requests_module
+        requests = requests_module
+    return requests
 
 class EnhancedWeatherService:
-    def __init__(self):
+    def __init__(self, cache=None, scheduler=None, transport=None, geocode_ttl=30 * 86400, live_ttl=1800,
+                 nasa_recent_ttl=6 * 3600, nasa_archive_ttl=30 * 86400,
+                 nasa_pending_recheck=3 * 3600):
+        # Upstream response cache (in-process by default, shared when configured)
+        self.cache = cache if cache is not None else MemoryCache()
+        self.geocode_ttl = geocode_ttl
+        self.live_ttl = live_ttl
+        # NASA POWER fills in recent days with a delay, older ranges are final
+        self.nasa_recent_ttl = nasa_recent_ttl
+        self.nasa_archive_ttl = nasa_archive_ttl
+        self.nasa_final_after_days = 7
+        # Days NASA has not published yet are asked for again only after this delay
+        self.nasa_pending_recheck = nasa_pending_recheck
+        self.rolling_window_max_days = 60
+
+        # Every upstream call waits for its host's rate budget here
+        self.scheduler = scheduler if scheduler is not None else UpstreamScheduler()
+        self._call_counter = threading.local()
+        # Hourly forecasts converted to compact arrays, kept per process
+        self._hourly_series = MemoryCache(max_entries=256, default_ttl=live_ttl)
+        self.hourly_forecast_days = 16
+
+        # passthrough, record or replay (offline) access to the upstream APIs
+        self.transport = transport if transport is not None else PassthroughTransport(_requests)
+
         # Geocoding
         self.openmeteo_geocoding_url = "https://geocoding-api.open-meteo.com/v1/search"
         
@@ -23,8 +85,49 @@ class EnhancedWeatherService:
         # NASA Historical Climate Data
         self.nasa_power_url = "https://power.larc.nasa.gov/api/temporal/daily/point"
         
+    def _request(self, url, params, timeout):
+        """GET an upstream URL within the host's rate budget and return the parsed JSON"""
+        host = urlparse(url).hostname
+        # Replayed responses never reach the network, so host budgets would only distort timings
+        rate_limited = self.transport.rate_limited
+        if rate_limited:
+            self.scheduler.acquire(host)
+        self._call_counter.count = self.thread_upstream_calls() + 1
+        response = self.transport.get(url, params=params, timeout=timeout)
+        if response.status_code == 429:
+            retry_after = response.headers.get('Retry-After')
+            retry_after = int(retry_after) if retry_after and retry_after.isdigit() else None
+            if rate_limited:
+                self.scheduler.penalize(host, retry_after)
+            raise UpstreamThrottled(host, 'rate limited by upstream', retry_after=retry_after)
+        response.raise_for_status()
+        return response.json()
+
+    def now(self):
+        """Current local time, pinned to the recording's time when replaying an archive"""
+        return self.transport.now()
+
+    def thread_upstream_calls(self):
+        """Number of upstream requests made so far by the current thread"""
+        return getattr(self._call_counter, 'count', 0)
+
+    def _cached(self, key, ttl, fetch, refresh=False):
+        """Return a cached upstream result, fetching and storing it on a miss (or always when refreshing)"""
+        if not refresh:
+            value = self.cache.get(key)
+            if value is not None:
+                return value
+        value = fetch()
+        if value is not None:
+            self.cache.set(key, value, ttl)
+        return value
+
     def get_coordinates(self, city_name):
         """Convert city name to coordinates using Open-Meteo Geocoding API"""
+        key = f"geo:{city_name.strip().lower()}"
+        return self._cached(key, self.geocode_ttl, lambda: self._fetch_coordinates(city_name))
+
+    def _fetch_coordinates(self, city_name):
         try:
             params = {
                 'name': city_name,
@@ -33,10 +136,7 @@ class EnhancedWeatherService:
                 'format': 'json'
             }
             
-            response = requests.get(self.openmeteo_geocoding_url, params=params, timeout=15)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = self._request(self.openmeteo_geocoding_url, params, timeout=15)
             
             if 'results' in data and len(data['results']) > 0:
                 # Try to find the best match (prefer cities with higher population)
@@ -60,12 +160,20 @@ class EnhancedWeatherService:
             else:
                 return None
                 
+        except (UpstreamThrottled, ReplayMiss):
+            raise
         except Exception as e:
             print(f"Geocoding error: {e}")
             return None
     
-    def get_live_weather_data(self, latitude, longitude, days=7):
+    def get_live_weather_data(self, latitude, longitude, days=7, refresh=False):
         """Get live weather forecast from Open-Meteo API"""
+        key = f"live:{latitude:.4f},{longitude:.4f}:{days}"
+        return self._cached(key, self.live_ttl,
+                            lambda: self._fetch_live_weather_data(latitude, longitude, days),
+                            refresh=refresh)
+
+    def _fetch_live_weather_data(self, latitude, longitude, days):
         try:
             params = {
                 'latitude': latitude,
@@ -75,17 +183,59 @@ class EnhancedWeatherService:
                 'forecast_days': days
             }
             
-            response = requests.get(self.openmeteo_weather_url, params=params, timeout=15)
-            response.raise_for_status()
-            
-            return response.json()
+            return self._request(self.openmeteo_weather_url, params, timeout=15)
             
+        except (UpstreamThrottled, ReplayMiss):
+            raise
         except Exception as e:
             print(f"Live weather API error: {e}")
             return None
     
+    def get_hourly_series(self, latitude, longitude, refresh=False):
+        """Hourly forecast as compact arrays, fetched once per location for the full 16-day range"""
+        key = f"hourly:{latitude:.4f},{longitude:.4f}"
+        if not refresh:
+            series = self._hourly_series.get(key)
+            if series is not None:
+                return series
+        hourly_data = self._cached(key, self.live_ttl,
+                                   lambda: self._fetch_hourly_weather_data(latitude, longitude),
+                                   refresh=refresh)
+        series = HourlySeries.from_open_meteo(hourly_data)
+        if series is not None:
+            self._hourly_series.set(key, series, self.live_ttl)
+        return series
+
+    def _fetch_hourly_weather_data(self, latitude, longitude):
+        try:
+            params = {
+                'latitude': latitude,
+                'longitude': longitude,
+                'hourly': ','.join(HOURLY_VARIABLES.values()),
+                'timezone': 'auto',
+                'forecast_days': self.hourly_forecast_days
+            }
+            
+            return self._request(self.openmeteo_weather_url, params, timeout=15)
+            
+        except (UpstreamThrottled, ReplayMiss):
+            raise
+        except Exception as e:
+            print(f"Hourly weather API error: {e}")
+            return None
+    
     def get_nasa_historical_data(self, latitude, longitude, start_date, end_date):
         """Fetch historical climate data from NASA POWER API"""
+        key = f"nasa:{latitude:.4f},{longitude:.4f}:{start_date}:{end_date}"
+        final_before = self.now() - timedelta(days=self.nasa_final_after_days)
+        if datetime.strptime(end_date, '%Y-%m-%d') < final_before:
+            ttl = self.nasa_archive_ttl
+        else:
+            ttl = self.nasa_recent_ttl
+        return self._cached(key, ttl,
+                            lambda: self._fetch_nasa_historical_data(latitude, longitude, start_date, end_date))
+
+    def _fetch_nasa_historical_data(self, latitude, longitude, start_date, end_date):
         try:
             # Convert date format from YYYY-MM-DD to YYYYMMDD
             start_date_int = int(start_date.replace('-', ''))
@@ -101,15 +251,84 @@ class EnhancedWeatherService:
                 'format': 'JSON'
             }
             
-            response = requests.get(self.nasa_power_url, params=params, timeout=30)
-            response.raise_for_status()
-            
-            return response.json()
+            return self._request(self.nasa_power_url, params, timeout=30)
             
+        except (UpstreamThrottled, ReplayMiss):
+            raise
         except Exception as e:
             print(f"NASA API error: {e}")
             return None
     
+    def get_daily_window(self, latitude, longitude, start_date, end_date):
+        """Processed NASA days for a date range, fetching only the days not already held for the location.
+        Returns None when nothing is available because an upstream fetch failed."""
+        key = f"nasa-days:{latitude:.4f},{longitude:.4f}"
+        # Copies, so concurrent requests never see a window being modified
+        window = self.cache.get(key) or {'days': {}, 'recheck': {}}
+        days = dict(window['days'])
+        recheck = dict(window['recheck'])
+        now = time.time()
+
+        start_dt = datetime.strptime(start_date, '%Y-%m-%d')
+        end_dt = datetime.strptime(end_date, '%Y-%m-%d')
+        dates = []
+        current = start_dt
+        while current <= end_dt:
+            dates.append(current)
+            current += timedelta(days=1)
+
+        # Days neither held nor waiting for their scheduled re-check
+        missing = [
+            dt for dt in dates
+            if not (dt.strftime('%Y%m%d') in days and days[dt.strftime('%Y%m%d')]['expires'] > now)
+            and recheck.get(dt.strftime('%Y%m%d'), 0) <= now
+        ]
+
+        # Fetch contiguous runs of missing days, usually just the newest one or two
+        runs = []
+        for dt in missing:
+            if runs and dt - runs[-1][-1] == timedelta(days=1):
+                runs[-1].append(dt)
+            else:
+                runs.append([dt])
+
+        failed = False
+        try:
+            for run in runs:
+                nasa_data = self._fetch_nasa_historical_data(
+                    latitude, longitude, run[0].strftime('%Y-%m-%d'), run[-1].strftime('%Y-%m-%d')
+                )
+                if not nasa_data:
+                    failed = True
+                    continue
+                fetched = {day.date: day for day in self.process_weather_data(nasa_data) or []}
+                for dt in run:
+                    date = dt.strftime('%Y%m%d')
+                    if date in fetched:
+                        # Published values are held until they leave the window, so each day is
+                        # downloaded once (stored in JSON shape so every cache backend can hold it)
+                        days[date] = {'day': fetched[date].to_dict(), 'expires': now + self.nasa_archive_ttl}
+                        recheck.pop(date, None)
+                    else:
+                        # Not finalized by NASA yet (fill values), look again later
+                        recheck[date] = now + self.nasa_pending_recheck
+        finally:
+            # Also on UpstreamThrottled, so the runs fetched before it are not lost
+            if runs:
+                # Keep only the most recent days so the window entry stays small
+                for held in (days, recheck):
+                    for date in sorted(held)[:-self.rolling_window_max_days]:
+                        del held[date]
+                self.cache.set(key, {'days': days, 'recheck': recheck}, self.nasa_archive_ttl)
+
+        result = [
+            DayRecord.from_dict(days[dt.strftime('%Y%m%d')]['day'])
+            for dt in dates if dt.strftime('%Y%m%d') in days
+        ]
+        if not result and failed:
+            return None
+        return result
+
     def process_weather_data(self, nasa_data):
         """Process NASA data and generate weather conditions"""
         if not nasa_data or 'properties' not in nasa_data:
@@ -148,28 +367,20 @@ class EnhancedWeatherService:
                 # Skip this date if data is missing
                 continue
             
-            day_data = {
-                'date': date,
-                'temperature': {
-                    'avg': temp_avg,
-                    'max': temp_max,
-                    'min': temp_min
-                },
-                'precipitation': precipitation,
-                'humidity': humidity,
-                'wind_speed': wind_speed,
-                'solar_radiation': solar_radiation,
-                'air_quality': {
-                    'aqi': 0,
-                    'pm2_5': 0,
-                    'pm10': 0,
-                    'ozone': 0,
-                    'status': 'Not Available (Historical Data)'
-                }
-            }
+            day_data = DayRecord(
+                date,
+                temp_avg,
+                temp_max,
+                temp_min,
+                precipitation,
+                humidity,
+                wind_speed,
+                solar_radiation,
+                HISTORICAL_AIR_QUALITY
+            )
             
             # Generate weather condition
-            day_data['condition'] = self.generate_weather_condition(day_data)
+            day_data.condition = self.generate_weather_condition(day_data)
             processed_days.append(day_data)
         
         return processed_days
@@ -197,13 +408,8 @@ class EnhancedWeatherService:
         # Ensure AQI is within reasonable bounds
         aqi = max(0, min(300, base_aqi))
         
-        return {
-            'aqi': aqi,
-            'pm2_5': round(aqi * 0.4, 1),  # Rough estimate
-            'pm10': round(aqi * 0.6, 1),   # Rough estimate
-            'ozone': round(aqi * 0.3, 1),  # Rough estimate
-            'status': self.get_aqi_status(aqi)
-        }
+        # Days with the same AQI share one AirQuality (PM2.5/PM10/ozone are rough estimates from it)
+        return air_quality_for(aqi, self.get_aqi_status(aqi))
     
     def calculate_aqi(self, pm2_5):
         """Calculate Air Quality Index from PM2.5 concentration"""
@@ -255,29 +461,28 @@ class EnhancedWeatherService:
             humidity = daily.get('relative_humidity_2m_max', [0] * num_days)[i]
             air_quality = self.estimate_air_quality(uv_index, humidity)
             
-            day_data = {
-                'date': daily['time'][i],
-                'temperature': {
-                    'avg': temp_avg,
-                    'max': daily['temperature_2m_max'][i],
-                    'min': daily['temperature_2m_min'][i]
-                },
-                'precipitation': daily['precipitation_sum'][i],
-                'humidity': daily.get('relative_humidity_2m_max', [0] * num_days)[i],
-                'wind_speed': daily.get('wind_speed_10m_max', [0] * num_days)[i] / 3.6,  # Convert km/h to m/s
-                'solar_radiation': daily.get('uv_index_max', [0] * num_days)[i] * 0.1,  # Convert UV index to approximate solar radiation
-                'air_quality': air_quality
-            }
+            day_data = DayRecord(
+                daily['time'][i],
+                temp_avg,
+                daily['temperature_2m_max'][i],
+                daily['temperature_2m_min'][i],
+                daily['precipitation_sum'][i],
+                daily.get('relative_humidity_2m_max', [0] * num_days)[i],
+                daily.get('wind_speed_10m_max', [0] * num_days)[i] / 3.6,  # Convert km/h to m/s
+                daily.get('uv_index_max', [0] * num_days)[i] * 0.1,  # Convert UV index to approximate solar radiation
+                air_quality
+            )
             
             # Generate weather condition
-            day_data['condition'] = self.generate_weather_condition(day_data)
+            day_data.condition = self.generate_weather_condition(day_data)
             processed_days.append(day_data)
         
         return processed_days
     
-    def compare_with_historical(self, live_data, historical_data):
+    def compare_with_historical(self, live_data, historical_data, aggregate=None):
         """Compare live forecast with historical NASA data and always return useful insights.
-        If historical data is missing, fall back to insights derived from the live forecast window."""
+        If historical data is missing, fall back to insights derived from the live forecast window.
+        Pass the request's ClimateAggregate to avoid walking the historical days again."""
         insights = []
 
         if not live_data:
@@ -287,11 +492,13 @@ class EnhancedWeatherService:
 
         # If we have historical data, compute comparisons
         if historical_data:
-            historical_avg = self.calculate_historical_average(historical_data)
+            if aggregate is None:
+                aggregate = aggregate_days(historical_data)
+            historical_avg = aggregate.historical_average()
             if historical_avg:
-                temp_diff = today_live['temperature']['avg'] - historical_avg['temperature']['avg']
-                precip_diff = today_live['precipitation'] - historical_avg['precipitation']
-                humidity_diff = today_live['humidity'] - historical_avg['humidity']
+                temp_diff = today_live.temp_avg - historical_avg['temperature']['avg']
+                precip_diff = today_live.precipitation - historical_avg['precipitation']
+                humidity_diff = today_live.humidity - historical_avg['humidity']
 
                 # Always include baseline comparisons (rounded to 1 decimal)
                 insights.append(
@@ -325,9 +532,9 @@ class EnhancedWeatherService:
 
         # Fallback: derive insights from the live forecast window when historical is unavailable
         try:
-            temps = [d['temperature']['avg'] for d in live_data if 'temperature' in d]
-            precs = [d.get('precipitation', 0) for d in live_data]
-            winds = [d.get('wind_speed', 0) for d in live_data]
+            temps = [d.temp_avg for d in live_data if d.temp_avg is not None]
+            precs = [d.precipitation for d in live_data]
+            winds = [d.wind_speed for d in live_data]
 
             if temps:
                 insights.append(
@@ -352,37 +559,38 @@ class EnhancedWeatherService:
         """Calculate average values from historical NASA data"""
         if not historical_data:
             return None
-        
-        temps = []
-        precipitations = []
-        humidities = []
-        
-        for day in historical_data:
-            if day['temperature']['avg'] is not None:
-                temps.append(day['temperature']['avg'])
-            if day['precipitation'] is not None:
-                precipitations.append(day['precipitation'])
-            if day['humidity'] is not None:
-                humidities.append(day['humidity'])
-        
-        if not temps:
-            return None
-        
-        return {
-            'temperature': {
-                'avg': sum(temps) / len(temps),
-                'max': max(temps),
-                'min': min(temps)
-            },
-            'precipitation': sum(precipitations) / len(precipitations) if precipitations else 0,
-            'humidity': sum(humidities) / len(humidities) if humidities else 0
-        }
+        return aggregate_days(historical_data).historical_average()
     
+    def insights_windows(self, now, years_back=3):
+        """The January 15-21 ranges of the previous years that the insights route compares against"""
+        return [(f"{year}-01-15", f"{year}-01-21") for year in range(now.year - 1, now.year - 1 - years_back, -1)]
+
+    def historical_windows(self, anchor, years_back=10, window_length_days=7):
+        """Date ranges covering the anchor's month/day window in each of the previous years"""
+        windows = []
+        month = anchor.month
+        day = anchor.day
+
+        for i in range(1, years_back + 1):
+            year = anchor.year - i
+            try:
+                start_dt = datetime(year, month, day)
+            except ValueError:
+                # Handle cases like Feb 29 on non-leap years by rolling to Feb 28
+                if month == 2 and day == 29:
+                    start_dt = datetime(year, 2, 28)
+                else:
+                    # Fallback to first of month
+                    start_dt = datetime(year, month, 1)
+            end_dt = start_dt + timedelta(days=window_length_days - 1)
+            windows.append((start_dt.strftime('%Y-%m-%d'), end_dt.strftime('%Y-%m-%d')))
+
+        return windows
+
     def generate_weather_condition(self, day_data):
         """Generate weather condition based on data"""
-        precipitation = day_data.get('precipitation', 0)
-        solar_radiation = day_data.get('solar_radiation', 0)
-        cloud_cover = day_data.get('cloud_cover', 0)
+        precipitation = day_data.precipitation
+        solar_radiation = day_data.solar_radiation
         
         # Simple condition logic based on precipitation and solar radiation
         if precipitation and precipitation > 2.5:  # > 2.5mm precipitation
@@ -396,10 +604,38 @@ class EnhancedWeatherService:
         else:
             return "Partly Cloudy"
 
-# Initialize the service
-weather_service = EnhancedWeatherService()
+class RecordJSONProvider(DefaultJSONProvider):
+    """JSON provider that writes day records in the API's dict shape"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, (DayRecord, AirQuality)):
+            return o.to_dict()
+        return DefaultJSONProvider.default(o)
+
+def record_hot_location():
+    """Count the requested city before the response cache can answer without running the route"""
+    city = request.args.get('city')
+    if city and request.path.startswith('/api/weather'):
+        hot_locations.record(city)
 
-@app.route('/api/weather', methods=['GET'])
+def upstream_throttled_response(error):
+    """503 with Retry-After when an upstream API is over its rate budget"""
+    headers = {'Retry-After': str(error.retry_after or 5)}
+    return jsonify({'error': f'Upstream service is busy, please retry shortly ({error.host})'}), 503, headers
+
+def partial_aware_response(result, partial):
+    """JSON response that is kept out of every cache when some historical years are missing"""
+    response = jsonify(result)
+    if partial:
+        response.cache_control.no_store = True
+    return response
+
+def replay_miss_response(error):
+    """502 when replay mode is asked for a request that was never recorded"""
+    return jsonify({'error': 'Upstream response not in replay archive', 'request': error.args[0]}), 502
+
+@api.route('/api/weather', methods=['GET'])
 def get_weather():
     """Get weather data for a city and date"""
     try:
@@ -411,7 +647,7 @@ def get_weather():
         
         if not date:
             # Default to today
-            date = datetime.now().strftime('%Y-%m-%d')
+            date = weather_service.now().strftime('%Y-%m-%d')
         
         # Validate date format
         try:
@@ -458,10 +694,14 @@ def get_weather():
         
         return jsonify(result)
         
+    except UpstreamThrottled as e:
+        return upstream_throttled_response(e)
+    except ReplayMiss as e:
+        return replay_miss_response(e)
     except Exception as e:
         return jsonify({'error': f'Internal server error: {str(e)}'}), 500
 
-@app.route('/api/weather/forecast', methods=['GET'])
+@api.route('/api/weather/forecast', methods=['GET'])
 def get_forecast():
     """Get weather forecast for a city for the next 7 days"""
     try:
@@ -476,22 +716,21 @@ def get_forecast():
             return jsonify({'error': f'Could not find coordinates for city: {city}'}), 404
         
         # Get forecast-like historical slice from the past 7 days up to today
-        end_date = datetime.now()
+        end_date = weather_service.now()
         start_date = (end_date - timedelta(days=6)).strftime('%Y-%m-%d')
         end_date_str = end_date.strftime('%Y-%m-%d')
         
-        nasa_data = weather_service.get_nasa_historical_data(
+        # Only the days not already held for this location are fetched from NASA
+        processed_data = weather_service.get_daily_window(
             coords['latitude'], 
             coords['longitude'], 
             start_date, 
             end_date_str
         )
         
-        if not nasa_data:
+        if processed_data is None:
             return jsonify({'error': 'Could not fetch forecast data from NASA'}), 500
         
-        processed_data = weather_service.process_weather_data(nasa_data)
-        
         if not processed_data:
             return jsonify({'error': f'No forecast data available for {city}. Try a different city.'}), 404
         
@@ -510,10 +749,14 @@ def get_forecast():
         
         return jsonify(result)
         
+    except UpstreamThrottled as e:
+        return upstream_throttled_response(e)
+    except ReplayMiss as e:
+        return replay_miss_response(e)
     except Exception as e:
         return jsonify({'error': f'Internal server error: {str(e)}'}), 500
 
-@app.route('/api/weather/enhanced', methods=['GET'])
+@api.route('/api/weather/enhanced', methods=['GET'])
 def get_enhanced_weather():
     """Get enhanced weather data with live forecast and historical comparison"""
     try:
@@ -546,48 +789,48 @@ def get_enhanced_weather():
             try:
                 anchor = datetime.strptime(requested_date, '%Y-%m-%d')
             except ValueError:
-                anchor = datetime.now()
+                anchor = weather_service.now()
         else:
-            anchor = datetime.now()
-
-        # 7-day window starting at anchor's month/day
-        window_length_days = 7
-        month = anchor.month
-        day = anchor.day
+            anchor = weather_service.now()
 
-        years_back = 10  # include roughly last decade
+        # 7-day windows starting at anchor's month/day over roughly the last decade
         historical_all = []
+        historical_aggregate = ClimateAggregate()
+        years_used = 0
+        partial = False
 
-        for i in range(1, years_back + 1):
-            year = anchor.year - i
+        for start_date, end_date in weather_service.historical_windows(anchor):
             try:
-                start_dt = datetime(year, month, day)
-            except ValueError:
-                # Handle cases like Feb 29 on non-leap years by rolling to Feb 28
-                if month == 2 and day == 29:
-                    start_dt = datetime(year, 2, 28)
-                else:
-                    # Fallback to first of month
-                    start_dt = datetime(year, month, 1)
-            end_dt = start_dt + timedelta(days=window_length_days - 1)
-
-            hist = weather_service.get_nasa_historical_data(
-                coords['latitude'],
-                coords['longitude'],
-                start_dt.strftime('%Y-%m-%d'),
-                end_dt.strftime('%Y-%m-%d')
-            )
+                hist = weather_service.get_nasa_historical_data(
+                    coords['latitude'],
+                    coords['longitude'],
+                    start_date,
+                    end_date
+                )
+            except UpstreamThrottled:
+                # Serve the years fetched so far rather than failing the whole request
+                partial = True
+                break
+            except ReplayMiss:
+                # A year the replay archive does not hold, the other years may still be there
+                partial = True
+                continue
             if hist:
                 processed = weather_service.process_weather_data(hist)
                 if processed:
+                    years_used += 1
                     historical_all.extend(processed)
+                    # Per-year partial aggregates merge into the request's single aggregate
+                    historical_aggregate.merge(aggregate_days(processed))
 
         # Step 4: Process the live data
         live_processed = weather_service.process_live_weather_data(live_data)
         historical_processed = historical_all if historical_all else None
         
         # Step 5: Generate insights
-        insights = weather_service.compare_with_historical(live_processed, historical_processed) if historical_processed else []
+        insights = weather_service.compare_with_historical(
+            live_processed, historical_processed, historical_aggregate
+        ) if historical_processed else []
         
         # Return the enhanced result
         result = {
@@ -603,6 +846,9 @@ def get_enhanced_weather():
             'live_forecast': live_processed,
             'historical_data': historical_processed,
             'insights': insights,
+            # partial: the upstream rate budget ran out before every year was fetched
+            'partial': partial,
+            'years_used': years_used,
             # Surface timezone information from the live weather provider so clients can format local time
             'timezone': live_data.get('timezone'),
             'timezone_abbreviation': live_data.get('timezone_abbreviation'),
@@ -613,12 +859,16 @@ def get_enhanced_weather():
             }
         }
         
-        return jsonify(result)
+        return partial_aware_response(result, partial)
         
+    except UpstreamThrottled as e:
+        return upstream_throttled_response(e)
+    except ReplayMiss as e:
+        return replay_miss_response(e)
     except Exception as e:
         return jsonify({'error': f'Internal server error: {str(e)}'}), 500
 
-@app.route('/api/weather/insights', methods=['GET'])
+@api.route('/api/weather/insights', methods=['GET'])
 def get_weather_insights():
     """Get weather insights and climate analysis for a city"""
     try:
@@ -643,45 +893,56 @@ def get_weather_insights():
             return jsonify({'error': 'Could not fetch live weather data'}), 500
         
         # Get historical data for the same date range over multiple years
-        current_year = datetime.now().year
-        historical_years = [current_year-1, current_year-2, current_year-3]
         all_historical_data = []
+        historical_aggregate = ClimateAggregate()
+        years_used = 0
+        partial = False
         
-        for year in historical_years:
-            start_date = f"{year}-01-15"
-            end_date = f"{year}-01-21"
-            
-            hist_data = weather_service.get_nasa_historical_data(
-                coords['latitude'], 
-                coords['longitude'], 
-                start_date, 
-                end_date
-            )
+        for start_date, end_date in weather_service.insights_windows(weather_service.now()):
+            try:
+                hist_data = weather_service.get_nasa_historical_data(
+                    coords['latitude'], 
+                    coords['longitude'], 
+                    start_date, 
+                    end_date
+                )
+            except UpstreamThrottled:
+                partial = True
+                break
+            except ReplayMiss:
+                partial = True
+                continue
             
             if hist_data:
                 processed = weather_service.process_weather_data(hist_data)
                 if processed:
+                    years_used += 1
                     all_historical_data.extend(processed)
+                    historical_aggregate.merge(aggregate_days(processed))
         
         # Process live data
         live_processed = weather_service.process_live_weather_data(live_data)
         
+        # One aggregate serves the comparison, the trend analysis and the response
+        historical_avg = historical_aggregate.historical_average()
+        
         # Generate comprehensive insights
-        insights = weather_service.compare_with_historical(live_processed, all_historical_data) if all_historical_data else []
+        insights = weather_service.compare_with_historical(
+            live_processed, all_historical_data, historical_aggregate
+        ) if all_historical_data else []
         
         # Add climate trend analysis
         if all_historical_data:
-            historical_avg = weather_service.calculate_historical_average(all_historical_data)
             if historical_avg and live_processed:
                 today = live_processed[0]
                 
                 # Add trend analysis
                 trend_insights = []
-                temp_trend = today['temperature']['avg'] - historical_avg['temperature']['avg']
+                temp_trend = today.temp_avg - historical_avg['temperature']['avg']
                 if abs(temp_trend) > 3:
                     trend_insights.append(f"Significant temperature anomaly: {temp_trend:+.1f}°C from historical average")
                 
-                precip_trend = today['precipitation'] - historical_avg['precipitation']
+                precip_trend = today.precipitation - historical_avg['precipitation']
                 if abs(precip_trend) > 2:
                     trend_insights.append(f"Notable precipitation difference: {precip_trend:+.1f}mm from historical average")
                 
@@ -697,22 +958,109 @@ def get_weather_insights():
                 }
             },
             'current_weather': live_processed[0] if live_processed else None,
-            'historical_average': weather_service.calculate_historical_average(all_historical_data),
+            'historical_average': historical_avg,
             'insights': insights,
-            'analysis_period': f"Comparing with {len(historical_years)} years of NASA historical data"
+            'analysis_period': f"Comparing with {years_used} years of NASA historical data",
+            'partial': partial,
+            'years_used': years_used
+        }
+        
+        return partial_aware_response(result, partial)
+        
+    except UpstreamThrottled as e:
+        return upstream_throttled_response(e)
+    except ReplayMiss as e:
+        return replay_miss_response(e)
+    except Exception as e:
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+
+@api.route('/api/weather/hourly', methods=['GET'])
+def get_hourly_weather():
+    """Get hourly forecast series for charts, downsampled to a point budget"""
+    try:
+        city = request.args.get('city')
+        
+        if not city:
+            return jsonify({'error': 'City parameter is required'}), 400
+        
+        try:
+            days = int(request.args.get('days', 7))
+            points = int(request.args.get('points', 200))
+        except ValueError:
+            return jsonify({'error': 'days and points must be integers'}), 400
+        
+        if not 1 <= days <= weather_service.hourly_forecast_days:
+            return jsonify({'error': f'days must be between 1 and {weather_service.hourly_forecast_days}'}), 400
+        if points < 3:
+            return jsonify({'error': 'points must be at least 3'}), 400
+        
+        metrics = request.args.get('metrics')
+        metrics = [m.strip() for m in metrics.split(',') if m.strip()] if metrics else list(HOURLY_VARIABLES)
+        unknown = [m for m in metrics if m not in HOURLY_VARIABLES]
+        if unknown:
+            return jsonify({'error': f"Unknown metrics: {', '.join(unknown)}. Use {', '.join(HOURLY_VARIABLES)}"}), 400
+        
+        # Get coordinates
+        coords = weather_service.get_coordinates(city)
+        if not coords:
+            return jsonify({'error': f'Could not find coordinates for city: {city}'}), 404
+        
+        # One cached 16-day hourly fetch serves every days/points combination
+        hourly = weather_service.get_hourly_series(coords['latitude'], coords['longitude'])
+        
+        if not hourly:
+            return jsonify({'error': 'Could not fetch hourly weather data'}), 500
+        
+        hours = min(days * 24, len(hourly.times))
+        
+        result = {
+            'city': {
+                'name': coords['name'],
+                'country': coords['country'],
+                'state': coords['admin1'],
+                'coordinates': {
+                    'latitude': coords['latitude'],
+                    'longitude': coords['longitude']
+                }
+            },
+            'days': days,
+            'source_points': hours,
+            'points': min(points, hours),
+            # Largest-triangle-three-buckets keeps rain and temperature peaks
+            'downsampling': 'lttb',
+            'series': hourly.downsample(points, metrics, hours),
+            'timezone': hourly.timezone,
+            'utc_offset_seconds': hourly.utc_offset_seconds
         }
         
         return jsonify(result)
         
+    except UpstreamThrottled as e:
+        return upstream_throttled_response(e)
+    except ReplayMiss as e:
+        return replay_miss_response(e)
     except Exception as e:
         return jsonify({'error': f'Internal server error: {str(e)}'}), 500
 
-@app.route('/api/health', methods=['GET'])
+@api.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({'status': 'healthy', 'service': 'NASA Weather API'})
 
-@app.route('/', methods=['GET'])
+@api.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Runtime metrics for sizing caches and budgets"""
+    return jsonify({
+        'compression': compressor.stats(),
+        'upstream_cache': weather_service.cache.stats(),
+        'upstream_scheduler': weather_service.scheduler.stats(),
+        'upstream_transport': weather_service.transport.stats(),
+        'prefetch': prefetcher.stats(),
+        'startup': startup_report.to_dict(),
+        'snapshot': snapshot_writer.last_written if snapshot_writer else None
+    })
+
+@api.route('/', methods=['GET'])
 def home():
     """Home endpoint with API documentation"""
     return jsonify({
@@ -722,19 +1070,157 @@ def home():
             '/api/weather/forecast': 'Get 7-day forecast for a city (GET)',
             '/api/weather/enhanced': 'Get enhanced weather with live forecast + NASA historical data (GET)',
             '/api/weather/insights': 'Get weather insights and climate analysis (GET)',
-            '/api/health': 'Health check (GET)'
+            '/api/weather/hourly': 'Get hourly forecast series downsampled for charts (GET)',
+            '/api/health': 'Health check (GET)',
+            '/api/metrics': 'Compression, cache, upstream, prefetch and startup metrics (GET)'
         },
         'parameters': {
             'city': 'City name (required)',
-            'date': 'Date in YYYY-MM-DD format (optional, defaults to today)'
+            'date': 'Date in YYYY-MM-DD format (optional, defaults to today)',
+            'points': 'Maximum points per hourly series (optional, defaults to 200)',
+            'metrics': 'Comma separated hourly metrics: temperature, precipitation, humidity, wind_speed (optional)'
         },
         'examples': {
             'current_weather': '/api/weather?city=New York&date=2024-01-15',
             'forecast': '/api/weather/forecast?city=London',
             'enhanced_weather': '/api/weather/enhanced?city=Tokyo&days=7',
-            'weather_insights': '/api/weather/insights?city=Paris'
+            'weather_insights': '/api/weather/insights?city=Paris',
+            'hourly_weather': '/api/weather/hourly?city=Berlin&days=7&points=120'
         }
     })
 
+def create_app():
+    """Application factory: load config, build the services and register the routes"""
+
+    with startup_report.phase('load_dotenv'):
+        from dotenv import load_dotenv
+        # Load environment variables
+        load_dotenv()
+
+    with startup_report.phase('create flask app'):
+        from flask_cors import CORS
+        app = Flask(__name__)
+        app.json = RecordJSONProvider(app)
+        CORS(app)
+
+        # Compress API responses and reuse compressed bodies for repeat requests
+        compressor = ResponseCompressor(
+            min_size=int(os.getenv('COMPRESSION_MIN_SIZE', 1024)),
+            gzip_level=int(os.getenv('COMPRESSION_GZIP_LEVEL', 6)),
+            brotli_quality=int(os.getenv('COMPRESSION_BROTLI_QUALITY', 5)),
+            cache_ttl=int(os.getenv('RESPONSE_CACHE_TTL', 300)),
+            max_entries=int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 256))
+        )
+        # Registered first so response cache hits are counted too
+        app.before_request(record_hot_location)
+        compressor.init_app(app)
+        app.register_blueprint(api)
+
+    with startup_report.phase('init weather service'):
+        # The configured rate limits are per host machine; token buckets live in each worker
+        # process, so every worker gets an equal share. gunicorn.conf.py sets UPSTREAM_WORKERS
+        # from gunicorn's resolved worker count.
+        workers = os.getenv('UPSTREAM_WORKERS') or os.getenv('WEB_CONCURRENCY')
+        if workers is None and 'gunicorn' in sys.modules:
+            print("Warning: UPSTREAM_WORKERS is not set, every gunicorn worker uses the full upstream "
+                  "rate limits (start gunicorn from Backend/ or with -c gunicorn.conf.py, or set it)")
+        workers = max(1, int(workers or 1))
+        openmeteo_rate = float(os.getenv('OPENMETEO_RATE_LIMIT', 8)) / workers
+        nasa_rate = float(os.getenv('NASA_RATE_LIMIT', 4)) / workers
+
+        # Initialize the service with the configured cache backend
+        # (CACHE_BACKEND=sqlite shares one store between all gunicorn workers on the host)
+        weather_service = EnhancedWeatherService(
+            cache=create_cache(
+                os.getenv('CACHE_BACKEND', 'memory'),
+                path=os.getenv('CACHE_PATH'),
+                max_entries=int(os.getenv('CACHE_MAX_ENTRIES', 0)) or None,
+                trim_every=int(os.getenv('CACHE_TRIM_EVERY', 0)) or None
+            ),
+            # Per-host token buckets (requests per second, burst) for the upstream APIs
+            scheduler=UpstreamScheduler(
+                limits={
+                    'geocoding-api.open-meteo.com': (openmeteo_rate, max(1, 20 // workers)),
+                    'api.open-meteo.com': (openmeteo_rate, max(1, 20 // workers)),
+                    'power.larc.nasa.gov': (nasa_rate, max(1, 10 // workers))
+                },
+                max_queue=int(os.getenv('UPSTREAM_MAX_QUEUE', 64))
+            ),
+            # UPSTREAM_MODE=record saves every upstream exchange, replay serves them offline
+            transport=create_transport(
+                os.getenv('UPSTREAM_MODE', 'passthrough'),
+                archive_path=os.getenv('UPSTREAM_ARCHIVE'),
+                latency=os.getenv('UPSTREAM_REPLAY_LATENCY_MS'),
+                load_requests=_requests,
+                # Replay runs at the recording's time, UPSTREAM_REPLAY_NOW overrides it
+                replay_now=os.getenv('UPSTREAM_REPLAY_NOW')
+            ),
+            geocode_ttl=int(os.getenv('GEOCODE_CACHE_TTL', 30 * 86400)),
+            live_ttl=int(os.getenv('LIVE_CACHE_TTL', 1800)),
+            nasa_recent_ttl=int(os.getenv('NASA_RECENT_CACHE_TTL', 6 * 3600)),
+            nasa_archive_ttl=int(os.getenv('NASA_ARCHIVE_CACHE_TTL', 30 * 86400)),
+            nasa_pending_recheck=int(os.getenv('NASA_PENDING_RECHECK', 3 * 3600))
+        )
+
+    # Restore geocodes, recent forecasts and climatology written by the previous instance
+    snapshot_path = os.getenv('SNAPSHOT_PATH')
+    snapshot_writer = None
+    if snapshot_path:
+        # One writer per host, whichever worker takes the lock first
+        snapshot_leader = LeaderLock(os.getenv('SNAPSHOT_LOCK_PATH', f"{snapshot_path}.lock"))
+        # The shared cache is restored by that worker only; workers started later
+        # (recycled or replacing a crashed one) find it already warm
+        if not isinstance(weather_service.cache, SQLiteCache) or snapshot_leader.acquire():
+            with startup_report.phase('restore cache snapshot'):
+                restored = restore_snapshot(weather_service.cache, snapshot_path)
+            print(f"Restored {restored} cache entries from {snapshot_path}")
+        snapshot_writer = SnapshotWriter(
+            weather_service.cache,
+            snapshot_path,
+            interval=int(os.getenv('SNAPSHOT_INTERVAL', 600)),
+            leader=snapshot_leader
+        )
+        snapshot_writer.start()
+        atexit.register(snapshot_writer.stop)
+
+    with startup_report.phase('init prefetch'):
+        # Track hot locations and keep their cache entries warm in the background
+        hot_locations = HotLocationTracker(half_life=int(os.getenv('PREFETCH_HALF_LIFE', 3600)))
+        prefetcher = PrefetchScheduler(
+            weather_service,
+            hot_locations,
+            top_n=int(os.getenv('PREFETCH_TOP_N', 20)),
+            interval=int(os.getenv('PREFETCH_INTERVAL', 1200)),
+            budget_per_cycle=int(os.getenv('PREFETCH_BUDGET', 100)),
+            # A single leader is only useful when its refreshes land in the shared cache;
+            # with the in-process cache every worker warms its own entries
+            lock_path=(os.getenv('PREFETCH_LOCK_PATH', 'prefetch.lock')
+                       if isinstance(weather_service.cache, SQLiteCache) else None)
+        )
+        prefetcher.warm_up(load_warmup_list(os.getenv('PREFETCH_WARMUP_FILE'), os.getenv('PREFETCH_WARMUP')))
+        if os.getenv('PREFETCH_ENABLED', 'false').lower() in ('1', 'true', 'yes'):
+            prefetcher.start()
+
+    app.extensions['weather_api'] = {
+        'compressor': compressor,
+        'weather_service': weather_service,
+        'hot_locations': hot_locations,
+        'prefetcher': prefetcher,
+        'snapshot_writer': snapshot_writer
+    }
+
+    print(startup_report.summary())
+    return app
+
+startup_report.record('import app module', time.perf_counter() - _import_started)
+
+def __getattr__(name):
+    # `gunicorn app:app` keeps working, the app is only built when first accessed
+    if name == 'app':
+        app = create_app()
+        globals()['app'] = app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
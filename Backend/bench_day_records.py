@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Day Record Memory Benchmark
+Measures allocations and peak memory for processing and serializing the days
+of one enhanced request (7 live days + 10 years x 7 historical days), offline.
+--dicts holds the days as nested dicts instead, like the service did before
+DayRecord, so both sides of a comparison can be reproduced.
+Usage: python bench_day_records.py [repeats] [--dicts]
+"""
+
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import app as weather_app
+
+NASA_PARAMETERS = ['T2M', 'T2M_MAX', 'T2M_MIN', 'PRECTOTCORR', 'RH2M', 'WS2M', 'ALLSKY_SFC_SW_DWN']
+
+
+def nasa_payload(start, days=7):
+    """Synthetic NASA POWER response for a window of days"""
+    parameter = {name: {} for name in NASA_PARAMETERS}
+    for i in range(days):
+        date = (start + timedelta(days=i)).strftime('%Y%m%d')
+        for j, name in enumerate(NASA_PARAMETERS):
+            parameter[name][date] = round(5.0 + (i * 3 + j * 7) % 25 + 0.25, 2)
+    return {'properties': {'parameter': parameter}}
+
+
+def live_payload(days=7):
+    """Synthetic Open-Meteo daily forecast response"""
+    start = datetime(2025, 6, 1)
+    return {
+        'daily': {
+            'time': [(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)],
+            'temperature_2m_max': [20.0 + i for i in range(days)],
+            'temperature_2m_min': [10.0 + i for i in range(days)],
+            'precipitation_sum': [float(i % 4) for i in range(days)],
+            'relative_humidity_2m_max': [60.0 + i for i in range(days)],
+            'wind_speed_10m_max': [12.0 + i for i in range(days)],
+            'uv_index_max': [float(i + 2) for i in range(days)]
+        }
+    }
+
+
+def build_request(service, live, windows, as_dicts=False):
+    live_days = service.process_live_weather_data(live)
+    historical = []
+    for payload in windows:
+        historical.extend(service.process_weather_data(payload))
+    if as_dicts:
+        # One nested dict per day, the records are dropped straight away
+        return [day.to_dict() for day in live_days], [day.to_dict() for day in historical]
+    return live_days, historical
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    as_dicts = '--dicts' in sys.argv[1:]
+    repeats = int(args[0]) if args else 200
+    flask_app = weather_app.create_app()
+    service = flask_app.extensions['weather_api']['weather_service']
+    live = live_payload()
+    windows = [nasa_payload(datetime(2015 + year, 6, 1)) for year in range(10)]
+
+    with flask_app.app_context():
+        # Warm up imports and caches before measuring
+        live_days, historical = build_request(service, live, windows, as_dicts)
+        flask_app.json.dumps({'live_forecast': live_days, 'historical_data': historical})
+
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        live_days, historical = build_request(service, live, windows, as_dicts)
+        after = tracemalloc.take_snapshot()
+        retained = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+        blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        body = flask_app.json.dumps({'live_forecast': live_days, 'historical_data': historical})
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        started = time.perf_counter()
+        for _ in range(repeats):
+            live_days, historical = build_request(service, live, windows, as_dicts)
+            flask_app.json.dumps({'live_forecast': live_days, 'historical_data': historical})
+        elapsed = time.perf_counter() - started
+
+    print("=" * 60)
+    print("DAY RECORD BENCHMARK")
+    print("=" * 60)
+    print(f"Day representation: {'nested dicts' if as_dicts else 'DayRecord'}")
+    print(f"Days per request: {len(live_days)} live + {len(historical)} historical")
+    print(f"Retained after processing: {retained / 1024:.1f} KiB in {blocks} blocks")
+    print(f"Peak during serialization: {(peak - base) / 1024:.1f} KiB (body {len(body) / 1024:.1f} KiB)")
+    print(f"Process + serialize: {elapsed / repeats * 1000:.3f} ms per request ({repeats} runs)")
+
+
+if __name__ == "__main__":
+    main()
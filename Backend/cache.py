@@ -0,0 +1,292 @@
+"""
+Cache backends for upstream data (geocodes, forecasts, NASA climate data).
+MemoryCache lives inside one process, SQLiteCache is a local WAL-mode store
+shared by every gunicorn worker on the host. Both expose the same interface,
+so the backend is picked by configuration.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class SQLiteConnections:
+    """WAL-mode connections to one SQLite file, one per thread and per process
+    (gunicorn forks after import, a connection must never cross the fork)"""
+
+    def __init__(self, path, timeout=5.0, pragmas=()):
+        self.path = path
+        self.timeout = timeout
+        self.pragmas = pragmas
+        self._local = threading.local()
+
+    def get(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        for pragma in self.pragmas:
+            conn.execute(f'PRAGMA {pragma}')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+
+class MemoryCache:
+    """In-process LRU cache with a per-entry TTL"""
+
+    def __init__(self, max_entries=1024, default_ttl=3600):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key):
+        """Return the cached value, or None when missing or expired"""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self._misses += 1
+                return None
+            expires_at, value = item
+            if expires_at < time.time():
+                del self._entries[key]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store a value for ttl seconds, evicting least recently used entries"""
+        expires_at = time.time() + (ttl if ttl is not None else self.default_ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def restore(self, entries):
+        """Add (key, value, expires_at) entries unless the key is already held longer, returns how many were added"""
+        now = time.time()
+        added = 0
+        with self._lock:
+            for key, value, expires_at in entries:
+                current = self._entries.get(key)
+                if expires_at <= now or (current is not None and current[0] >= expires_at):
+                    continue
+                self._entries[key] = (expires_at, value)
+                self._entries.move_to_end(key)
+                added += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return added
+
+    def items(self, prefixes=None):
+        """Live (key, value, expires_at) entries, optionally only keys with the given prefixes"""
+        now = time.time()
+        with self._lock:
+            entries = list(self._entries.items())
+        return [
+            (key, value, expires_at) for key, (expires_at, value) in entries
+            if expires_at >= now and (not prefixes or key.startswith(tuple(prefixes)))
+        ]
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self._hits,
+                'misses': self._misses
+            }
+
+
+class SQLiteCache:
+    """Host-wide cache in a local SQLite file (WAL mode) shared across workers.
+
+    Values are stored as JSON. Every trim_every writes the store is trimmed to
+    max_entries: expired rows go first, then the rows closest to expiry, so reads
+    never need to write. Between trims it can hold up to trim_every extra rows
+    per worker.
+    """
+
+    def __init__(self, path, max_entries=10000, default_ttl=3600, busy_timeout=5.0, trim_every=100):
+        self.path = path
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.busy_timeout = busy_timeout
+        self.trim_every = max(1, trim_every)
+        self._connections = SQLiteConnections(path, busy_timeout, pragmas=('synchronous=NORMAL',))
+        # Hit/miss and write counters are per worker, the entry count is shared
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)')
+
+    def _connect(self):
+        return self._connections.get()
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+    def get(self, key):
+        """Return the cached value, or None when missing or expired"""
+        try:
+            row = self._connect().execute(
+                'SELECT value FROM cache WHERE key = ? AND expires_at >= ?',
+                (key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Cache read error: {e}")
+            row = None
+        self._count(row is not None)
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl=None):
+        """Store a value for ttl seconds, trimming the store to max_entries every trim_every writes"""
+        now = time.time()
+        expires_at = now + (ttl if ttl is not None else self.default_ttl)
+        with self._lock:
+            self._writes += 1
+            # Trimming counts the whole table, too costly to run on every write
+            trim = self._writes % self.trim_every == 0
+        try:
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute(
+                    'INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)',
+                    (key, json.dumps(value, separators=(',', ':')), expires_at)
+                )
+                if trim:
+                    self._trim(conn, now)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error as e:
+            print(f"Cache write error: {e}")
+
+    def restore(self, entries):
+        """Add (key, value, expires_at) entries unless the key is already held longer, returns how many were added"""
+        now = time.time()
+        rows = [
+            (key, json.dumps(value, separators=(',', ':')), expires_at)
+            for key, value, expires_at in entries if expires_at > now
+        ]
+        try:
+            conn = self._connect()
+            # One transaction for the whole snapshot, fresher rows written by other workers win
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                changes = conn.total_changes
+                conn.executemany(
+                    'INSERT INTO cache (key, value, expires_at) VALUES (?, ?, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at '
+                    'WHERE excluded.expires_at > cache.expires_at',
+                    rows
+                )
+                added = conn.total_changes - changes
+                self._trim(conn, now)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error as e:
+            print(f"Cache write error: {e}")
+            return 0
+        return added
+
+    def _trim(self, conn, now):
+        conn.execute('DELETE FROM cache WHERE expires_at < ?', (now,))
+        conn.execute(
+            'DELETE FROM cache WHERE key IN ('
+            'SELECT key FROM cache ORDER BY expires_at LIMIT '
+            'max(0, (SELECT COUNT(*) FROM cache) - ?))',
+            (self.max_entries,)
+        )
+
+    def items(self, prefixes=None):
+        """Live (key, value, expires_at) entries, optionally only keys with the given prefixes"""
+        try:
+            rows = self._connect().execute(
+                'SELECT key, value, expires_at FROM cache WHERE expires_at >= ?', (time.time(),)
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Cache read error: {e}")
+            return []
+        return [
+            (key, json.loads(value), expires_at) for key, value, expires_at in rows
+            if not prefixes or key.startswith(tuple(prefixes))
+        ]
+
+    def delete(self, key):
+        try:
+            self._connect().execute('DELETE FROM cache WHERE key = ?', (key,))
+        except sqlite3.Error as e:
+            print(f"Cache delete error: {e}")
+
+    def clear(self):
+        try:
+            self._connect().execute('DELETE FROM cache')
+        except sqlite3.Error as e:
+            print(f"Cache clear error: {e}")
+
+    def stats(self):
+        try:
+            entries = self._connect().execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        with self._lock:
+            return {
+                'backend': 'sqlite',
+                'path': self.path,
+                'entries': entries,
+                'max_entries': self.max_entries,
+                'hits': self._hits,
+                'misses': self._misses
+            }
+
+
+def create_cache(backend='memory', path=None, max_entries=None, default_ttl=3600, trim_every=None):
+    """Build the cache backend selected by configuration"""
+    backend = (backend or 'memory').lower()
+    if backend == 'sqlite':
+        return SQLiteCache(
+            path or 'weather_cache.sqlite3',
+            max_entries=max_entries or 10000,
+            default_ttl=default_ttl,
+            trim_every=trim_every or 100
+        )
+    if backend == 'memory':
+        return MemoryCache(max_entries=max_entries or 1024, default_ttl=default_ttl)
+    raise ValueError(f"Unknown cache backend: {backend}")
@@ -0,0 +1,216 @@
+"""
+Response compression for the API routes.
+Negotiates gzip/brotli from Accept-Encoding and keeps compressed variants next
+to cached response bodies so repeat hits reuse bytes instead of recompressing.
+"""
+
+import gzip
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+
+class CachedResponse:
+    """A cached response body plus every encoded variant built for it so far"""
+    __slots__ = ('body', 'mimetype', 'created', 'variants')
+
+    def __init__(self, body, mimetype):
+        self.body = body
+        self.mimetype = mimetype
+        self.created = time.monotonic()
+        self.variants = {}
+
+
+class ResponseCompressor:
+    def __init__(self, min_size=1024, gzip_level=6, brotli_quality=5,
+                 cache_ttl=300, max_entries=256,
+                 compress_prefix='/api/', cache_prefix='/api/weather'):
+        # Bodies smaller than this are sent as-is, compression would not pay off
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+        # Response cache (cache_ttl <= 0 disables it, compression still applies)
+        self.cache_ttl = cache_ttl
+        self.max_entries = max_entries
+        self.compress_prefix = compress_prefix
+        self.cache_prefix = cache_prefix
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Preferred order when the client accepts several encodings equally
+        self.encodings = ['br', 'gzip'] if brotli else ['gzip']
+        self._stats = {
+            encoding: {'responses': 0, 'compressions': 0, 'reused': 0, 'cpu_seconds': 0.0,
+                       'bytes_original': 0, 'bytes_out': 0}
+            for encoding in self.encodings
+        }
+        self._stats['identity'] = {'responses': 0, 'bytes_out': 0}
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+    def init_app(self, app):
+        """Register the request hooks on a Flask app"""
+        app.before_request(self._serve_from_cache)
+        app.after_request(self._process_response)
+
+    def choose_encoding(self, accept_encoding):
+        """Pick the best supported encoding from an Accept-Encoding header"""
+        if not accept_encoding:
+            return None
+
+        weights = {}
+        for part in accept_encoding.split(','):
+            token, _, params = part.strip().partition(';')
+            token = token.strip().lower()
+            quality = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            if token:
+                weights[token] = quality
+
+        best = None
+        best_quality = 0.0
+        for encoding in self.encodings:
+            quality = weights.get(encoding, weights.get('*', 0.0))
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def compress(self, body, encoding):
+        """Compress a body and record CPU time and sizes for the encoding"""
+        # This thread's CPU time only, other requests and background jobs run alongside
+        started = time.thread_time()
+        if encoding == 'br':
+            data = brotli.compress(body, quality=self.brotli_quality)
+        else:
+            data = gzip.compress(body, compresslevel=self.gzip_level)
+        elapsed = time.thread_time() - started
+
+        with self._lock:
+            stats = self._stats[encoding]
+            stats['compressions'] += 1
+            stats['cpu_seconds'] += elapsed
+        return data
+
+    def get_cached(self, key):
+        """Return a fresh cached response for the key, or None"""
+        if self.cache_ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                self._cache_misses += 1
+                return None
+            if time.monotonic() - entry.created > self.cache_ttl:
+                del self._cache[key]
+                self._cache_misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self._cache_hits += 1
+            return entry
+
+    def store(self, key, body, mimetype):
+        """Cache a response body, evicting the least recently used entries"""
+        entry = CachedResponse(body, mimetype)
+        if self.cache_ttl <= 0:
+            return entry
+        with self._lock:
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return entry
+
+    def encoded_body(self, entry, encoding):
+        """Get the encoded variant of a cached body, compressing only once"""
+        data = entry.variants.get(encoding)
+        if data is not None:
+            with self._lock:
+                self._stats[encoding]['reused'] += 1
+            return data
+        data = self.compress(entry.body, encoding)
+        entry.variants[encoding] = data
+        return data
+
+    def stats(self):
+        """Snapshot of per-encoding counters and response cache usage"""
+        with self._lock:
+            encodings = {name: dict(values) for name, values in self._stats.items()}
+            cache = {
+                'entries': len(self._cache),
+                'hits': self._cache_hits,
+                'misses': self._cache_misses,
+                'ttl_seconds': self.cache_ttl
+            }
+        for values in encodings.values():
+            if values.get('bytes_original'):
+                values['ratio'] = round(values['bytes_out'] / values['bytes_original'], 3)
+        return {
+            'min_size': self.min_size,
+            'encodings': encodings,
+            'response_cache': cache
+        }
+
+    def _is_cacheable_request(self):
+        return (self.cache_ttl > 0 and request.method == 'GET'
+                and request.path.startswith(self.cache_prefix))
+
+    def _serve_from_cache(self):
+        if not self._is_cacheable_request():
+            return None
+        entry = self.get_cached(request.full_path)
+        if entry is None:
+            return None
+
+        response = current_app.response_class(entry.body, mimetype=entry.mimetype)
+        response.headers['X-Cache'] = 'HIT'
+        g.cached_response = entry
+        return response
+
+    def _process_response(self, response):
+        if not request.path.startswith(self.compress_prefix):
+            return response
+        if response.direct_passthrough or 'Content-Encoding' in response.headers:
+            return response
+
+        entry = g.pop('cached_response', None)
+        # Routes mark incomplete answers no-store, so a retry can fetch the missing parts
+        if (entry is None and response.status_code == 200 and not response.cache_control.no_store
+                and self._is_cacheable_request()):
+            entry = self.store(request.full_path, response.get_data(), response.mimetype)
+            response.headers['X-Cache'] = 'MISS'
+
+        response.vary.add('Accept-Encoding')
+        body_size = response.content_length or len(response.get_data())
+        encoding = self.choose_encoding(request.headers.get('Accept-Encoding'))
+        if encoding is None or body_size < self.min_size:
+            with self._lock:
+                self._stats['identity']['responses'] += 1
+                self._stats['identity']['bytes_out'] += body_size
+            return response
+
+        if entry is not None:
+            data = self.encoded_body(entry, encoding)
+        else:
+            data = self.compress(response.get_data(), encoding)
+
+        response.set_data(data)
+        response.headers['Content-Encoding'] = encoding
+        with self._lock:
+            stats = self._stats[encoding]
+            stats['responses'] += 1
+            stats['bytes_original'] += body_size
+            stats['bytes_out'] += len(data)
+        return response
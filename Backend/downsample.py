@@ -0,0 +1,95 @@
+"""
+Hourly series storage and shape-preserving downsampling for charts.
+Hourly values are kept in compact float arrays and reduced to a point budget
+with largest-triangle-three-buckets (LTTB), which keeps peaks such as rain
+bursts and temperature extremes that plain averaging would flatten.
+"""
+
+import math
+from array import array
+
+# API metric name -> Open-Meteo hourly variable
+HOURLY_VARIABLES = {
+    'temperature': 'temperature_2m',
+    'precipitation': 'precipitation',
+    'humidity': 'relative_humidity_2m',
+    'wind_speed': 'wind_speed_10m',
+}
+
+
+def lttb(values, threshold):
+    """Indices of the points LTTB keeps from evenly spaced values (NaN counts as 0)"""
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    def value(i):
+        v = values[i]
+        return 0.0 if math.isnan(v) else v
+
+    indices = [0]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_x = (avg_start + avg_end - 1) / 2
+        avg_y = sum(value(j) for j in range(avg_start, avg_end)) / (avg_end - avg_start)
+
+        # Pick the point of this bucket forming the largest triangle with a and the average
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+        a_y = value(a)
+        best, best_area = range_start, -1.0
+        for j in range(range_start, range_end):
+            area = abs((a - avg_x) * (value(j) - a_y) - (a - j) * (avg_y - a_y))
+            if area > best_area:
+                best, best_area = j, area
+        indices.append(best)
+        a = best
+
+    indices.append(n - 1)
+    return indices
+
+
+class HourlySeries:
+    """Hourly forecast for one location: shared time axis plus a float array per metric"""
+    __slots__ = ('times', 'metrics', 'timezone', 'utc_offset_seconds')
+
+    def __init__(self, times, metrics, timezone=None, utc_offset_seconds=None):
+        self.times = times
+        self.metrics = metrics
+        self.timezone = timezone
+        self.utc_offset_seconds = utc_offset_seconds
+
+    @classmethod
+    def from_open_meteo(cls, hourly_data):
+        """Build from an Open-Meteo response with an 'hourly' block, None values become NaN"""
+        if not hourly_data or 'hourly' not in hourly_data:
+            return None
+        hourly = hourly_data['hourly']
+        times = tuple(hourly.get('time', []))
+        metrics = {}
+        for name, variable in HOURLY_VARIABLES.items():
+            raw = hourly.get(variable)
+            if raw is None:
+                continue
+            metrics[name] = array('d', (math.nan if v is None else v for v in raw))
+        return cls(times, metrics, hourly_data.get('timezone'), hourly_data.get('utc_offset_seconds'))
+
+    def downsample(self, points, names=None, hours=None):
+        """Each requested metric over the first `hours` reduced to at most `points` (time, value) pairs"""
+        series = {}
+        for name in names or self.metrics:
+            values = self.metrics.get(name)
+            if values is None:
+                continue
+            if hours is not None:
+                values = values[:hours]
+            indices = lttb(values, points)
+            series[name] = {
+                'time': [self.times[i] for i in indices],
+                'values': [None if math.isnan(values[i]) else values[i] for i in indices]
+            }
+        return series
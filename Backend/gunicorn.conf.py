@@ -0,0 +1,14 @@
+"""
+Gunicorn hooks, loaded automatically when gunicorn is started from Backend/
+(gunicorn app:app -w 4). Deployments with their own config file need the same hook,
+or UPSTREAM_WORKERS set to the worker count.
+"""
+
+import os
+
+
+def on_starting(server):
+    # The app splits the host-wide upstream rate limits between the workers. Gunicorn
+    # resolves -w, WEB_CONCURRENCY and config files into cfg.workers without exporting
+    # it, so the count reaches the workers (forked after this hook) through the environment
+    os.environ.setdefault('UPSTREAM_WORKERS', str(server.cfg.workers))
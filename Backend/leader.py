@@ -0,0 +1,42 @@
+"""
+One leader process per host.
+Background jobs that act on host-wide state (refreshing the shared cache,
+writing the cache snapshot) should run in a single gunicorn worker. The
+worker holding a non-blocking exclusive flock on the lock file is the leader
+until it exits, then another worker takes over on its next attempt.
+"""
+
+import threading
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows, every worker leads there
+    fcntl = None
+
+
+class LeaderLock:
+    def __init__(self, path):
+        # path=None makes every process a leader
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    @property
+    def held(self):
+        return self._file is not None or not self.path or fcntl is None
+
+    def acquire(self):
+        """True when this process is, or has just become, the leader"""
+        if self.held:
+            return True
+        with self._lock:
+            if self._file is not None:
+                return True
+            lock_file = open(self.path, 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+            self._file = lock_file
+            return True
@@ -0,0 +1,192 @@
+"""
+Hot-location prefetch.
+Tracks how often each city is requested (exponentially decayed counts) and
+refreshes the forecasts, hourly series and historical windows the routes read
+for the most requested cities in the background, before their cache entries
+expire.
+"""
+
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import partial
+
+from leader import LeaderLock
+from upstream import PREFETCH, UpstreamThrottled, priority
+
+
+class HotLocationTracker:
+    """Request frequency per location with exponential decay"""
+
+    def __init__(self, half_life=3600, max_tracked=1000):
+        self.half_life = half_life
+        self.max_tracked = max_tracked
+        self._scores = {}
+        self._lock = threading.Lock()
+
+    def _decayed(self, score, updated, now):
+        return score * math.pow(0.5, (now - updated) / self.half_life)
+
+    def record(self, location, weight=1.0):
+        """Count one request (or weight requests) for a location"""
+        location = location.strip().lower()
+        if not location:
+            return
+        now = time.time()
+        with self._lock:
+            score, updated = self._scores.get(location, (0.0, now))
+            self._scores[location] = (self._decayed(score, updated, now) + weight, now)
+            if len(self._scores) > self.max_tracked:
+                self._prune(now)
+
+    def _prune(self, now):
+        # Drop the coldest half so pruning stays rare
+        ranked = sorted(self._scores.items(),
+                        key=lambda item: self._decayed(item[1][0], item[1][1], now))
+        for location, _ in ranked[:len(ranked) // 2]:
+            del self._scores[location]
+
+    def top(self, n):
+        """The n most requested locations with their current scores"""
+        now = time.time()
+        with self._lock:
+            scores = [(location, self._decayed(score, updated, now))
+                      for location, (score, updated) in self._scores.items()]
+        scores.sort(key=lambda item: item[1], reverse=True)
+        return scores[:n]
+
+
+def load_warmup_list(path=None, cities=None):
+    """City names from a file (one per line, # comments) and/or a comma separated string"""
+    locations = []
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    locations.append(line)
+    if cities:
+        locations.extend(city.strip() for city in cities.split(',') if city.strip())
+    return locations
+
+
+class PrefetchScheduler:
+    def __init__(self, service, tracker, top_n=20, interval=1200, budget_per_cycle=100,
+                 days=7, days_ahead=1, lock_path=None):
+        self.service = service
+        self.tracker = tracker
+        self.top_n = top_n
+        # Keep the interval below the live forecast TTL so hot entries never go cold
+        self.interval = interval
+        # Maximum upstream requests one refresh cycle may spend
+        self.budget_per_cycle = budget_per_cycle
+        self.days = days
+        self.days_ahead = days_ahead
+        # With a shared cache, only one gunicorn worker per host runs the refresh loop
+        # (lock_path=None lets every worker refresh its own cache)
+        self.leader = LeaderLock(lock_path)
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_cycle = {}
+
+    def warm_up(self, locations, weight=5.0):
+        """Seed the tracker so boot-time locations are refreshed first"""
+        for location in locations:
+            self.tracker.record(location, weight)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='prefetch', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.leader.acquire():
+                try:
+                    self.run_cycle()
+                except Exception as e:
+                    print(f"Prefetch error: {e}")
+            self._stop.wait(self.interval)
+
+    def run_cycle(self):
+        """Refresh the hottest locations until the cycle's upstream budget is spent"""
+        started = time.time()
+        calls_before = self.service.thread_upstream_calls()
+        refreshed = []
+
+        def spent():
+            return self.service.thread_upstream_calls() - calls_before
+
+        with priority(PREFETCH):
+            for location, _ in self.tracker.top(self.top_n):
+                if spent() >= self.budget_per_cycle:
+                    break
+                try:
+                    self._refresh_location(location, spent)
+                except UpstreamThrottled:
+                    # The interactive traffic needs the budget more, try again next cycle
+                    break
+                refreshed.append(location)
+
+        self.last_cycle = {
+            'started': datetime.fromtimestamp(started).isoformat(timespec='seconds'),
+            'duration_seconds': round(time.time() - started, 3),
+            'locations_refreshed': refreshed,
+            'upstream_calls': spent()
+        }
+        return self.last_cycle
+
+    def _refresh_location(self, location, spent):
+        """Refresh the entries the routes read for one location, checking the budget before each call"""
+        if spent() >= self.budget_per_cycle:
+            return
+        coords = self.service.get_coordinates(location)
+        if not coords:
+            return
+        latitude, longitude = coords['latitude'], coords['longitude']
+        service = self.service
+        today = service.now()
+
+        # Short TTL entries are always refreshed: the enhanced forecast, the one-day forecast
+        # of /insights and the hourly series
+        steps = [
+            partial(service.get_live_weather_data, latitude, longitude, self.days, refresh=True),
+            partial(service.get_live_weather_data, latitude, longitude, 1, refresh=True),
+            partial(service.get_hourly_series, latitude, longitude, refresh=True),
+            # The rolling /forecast window only asks NASA for the days it does not hold yet
+            partial(service.get_daily_window, latitude, longitude,
+                    (today - timedelta(days=6)).strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d')),
+        ]
+        # Historical ranges are fetched only when missing: today's day for /api/weather,
+        # /insights, then /enhanced for today and the next days
+        windows = [(today.strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d'))]
+        windows.extend(service.insights_windows(today))
+        for offset in range(self.days_ahead + 1):
+            windows.extend(service.historical_windows(today + timedelta(days=offset)))
+        for start_date, end_date in windows:
+            steps.append(partial(service.get_nasa_historical_data, latitude, longitude, start_date, end_date))
+
+        for step in steps:
+            if spent() >= self.budget_per_cycle:
+                return
+            step()
+
+    def stats(self):
+        return {
+            'running': bool(self._thread and self._thread.is_alive()),
+            'leader': self.leader.held,
+            'interval_seconds': self.interval,
+            'budget_per_cycle': self.budget_per_cycle,
+            'hot_locations': [
+                {'location': location, 'score': round(score, 3)}
+                for location, score in self.tracker.top(self.top_n)
+            ],
+            'last_cycle': self.last_cycle
+        }
@@ -0,0 +1,110 @@
+"""
+Compact typed records for processed weather days.
+A DayRecord replaces the per-day dict with nested temperature and air quality
+dicts; air quality values are shared instances (one sentinel for every
+historical day) and condition/status strings are interned. to_dict() gives
+the existing JSON shape.
+"""
+
+import sys
+
+
+class AirQuality:
+    """Air quality values for a day, shared between days with the same AQI"""
+    __slots__ = ('aqi', 'pm2_5', 'pm10', 'ozone', 'status')
+
+    def __init__(self, aqi, pm2_5, pm10, ozone, status):
+        self.aqi = aqi
+        self.pm2_5 = pm2_5
+        self.pm10 = pm10
+        self.ozone = ozone
+        self.status = sys.intern(status)
+
+    def to_dict(self):
+        # A fresh dict every time: instances are shared, callers may modify what they get
+        return {
+            'aqi': self.aqi,
+            'pm2_5': self.pm2_5,
+            'pm10': self.pm10,
+            'ozone': self.ozone,
+            'status': self.status
+        }
+
+
+# NASA gives no air quality, every historical day shares this placeholder
+HISTORICAL_AIR_QUALITY = AirQuality(0, 0, 0, 0, 'Not Available (Historical Data)')
+
+_air_quality_by_aqi = {}
+
+
+def air_quality_for(aqi, status):
+    """Shared AirQuality for an estimated AQI (the PM/ozone figures derive from it)"""
+    air_quality = _air_quality_by_aqi.get(aqi)
+    if air_quality is None:
+        air_quality = AirQuality(
+            aqi,
+            round(aqi * 0.4, 1),  # Rough estimate
+            round(aqi * 0.6, 1),  # Rough estimate
+            round(aqi * 0.3, 1),  # Rough estimate
+            status
+        )
+        _air_quality_by_aqi[aqi] = air_quality
+    return air_quality
+
+
+class DayRecord:
+    """One processed day of live or historical weather"""
+    __slots__ = ('date', 'temp_avg', 'temp_max', 'temp_min', 'precipitation', 'humidity',
+                 'wind_speed', 'solar_radiation', 'air_quality', 'condition')
+
+    def __init__(self, date, temp_avg, temp_max, temp_min, precipitation, humidity,
+                 wind_speed, solar_radiation, air_quality, condition=None):
+        self.date = date
+        self.temp_avg = temp_avg
+        self.temp_max = temp_max
+        self.temp_min = temp_min
+        self.precipitation = precipitation
+        self.humidity = humidity
+        self.wind_speed = wind_speed
+        self.solar_radiation = solar_radiation
+        self.air_quality = air_quality
+        self.condition = condition
+
+    def to_dict(self):
+        """The day in the API's JSON shape"""
+        return {
+            'date': self.date,
+            'temperature': {
+                'avg': self.temp_avg,
+                'max': self.temp_max,
+                'min': self.temp_min
+            },
+            'precipitation': self.precipitation,
+            'humidity': self.humidity,
+            'wind_speed': self.wind_speed,
+            'solar_radiation': self.solar_radiation,
+            'air_quality': self.air_quality.to_dict(),
+            'condition': self.condition
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a record from its JSON shape (e.g. when read back from a cache)"""
+        temperature = data['temperature']
+        air_quality = data['air_quality']
+        if air_quality['status'] == HISTORICAL_AIR_QUALITY.status:
+            air_quality = HISTORICAL_AIR_QUALITY
+        else:
+            air_quality = air_quality_for(air_quality['aqi'], air_quality['status'])
+        return cls(
+            data['date'],
+            temperature['avg'],
+            temperature['max'],
+            temperature['min'],
+            data['precipitation'],
+            data['humidity'],
+            data['wind_speed'],
+            data['solar_radiation'],
+            air_quality,
+            sys.intern(data['condition']) if data.get('condition') else None
+        )
@@ -0,0 +1,107 @@
+"""
+Cold-start support: per-phase startup timing and cache snapshots.
+A snapshot holds the warm upstream cache entries (geocodes, recent forecasts,
+climatology) so a freshly started instance can serve its first requests warm.
+"""
+
+import contextlib
+import gzip
+import json
+import os
+import threading
+import time
+
+# Cache key prefixes worth carrying over a restart
+SNAPSHOT_PREFIXES = ('geo:', 'live:', 'hourly:', 'nasa:', 'nasa-days:')
+
+
+class StartupReport:
+    """Wall-clock time spent in each import and init phase"""
+
+    def __init__(self):
+        self.phases = []
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            self.phases.append((name, seconds))
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def to_dict(self):
+        with self._lock:
+            phases = list(self.phases)
+        return {
+            'phases': [{'phase': name, 'ms': round(seconds * 1000, 2)} for name, seconds in phases],
+            'total_ms': round(sum(seconds for _, seconds in phases) * 1000, 2)
+        }
+
+    def summary(self):
+        report = self.to_dict()
+        parts = ', '.join(f"{p['phase']} {p['ms']:.1f}ms" for p in report['phases'])
+        return f"Startup {report['total_ms']:.1f}ms: {parts}"
+
+
+def write_snapshot(cache, path, prefixes=SNAPSHOT_PREFIXES):
+    """Write live cache entries to a gzipped JSON file, replacing it atomically"""
+    entries = [[key, value, expires_at] for key, value, expires_at in cache.items(prefixes)]
+    payload = {'written_at': time.time(), 'entries': entries}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(payload, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    return len(entries)
+
+
+def restore_snapshot(cache, path):
+    """Load unexpired snapshot entries the cache does not already hold for longer, returns how many were restored"""
+    if not path or not os.path.exists(path):
+        return 0
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            payload = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Snapshot restore error: {e}")
+        return 0
+
+    return cache.restore(payload.get('entries', []))
+
+
+class SnapshotWriter:
+    """Writes the cache snapshot on an interval and once more at shutdown"""
+
+    def __init__(self, cache, path, interval=0, leader=None):
+        self.cache = cache
+        self.path = path
+        self.interval = interval
+        # Only the worker holding the leader lock writes, the others would race on the same file
+        self.leader = leader
+        self.last_written = None
+        self._stop = threading.Event()
+
+    def write(self):
+        if self.leader is not None and not self.leader.acquire():
+            return
+        try:
+            count = write_snapshot(self.cache, self.path)
+            self.last_written = {'at': time.time(), 'entries': count}
+        except OSError as e:
+            print(f"Snapshot write error: {e}")
+
+    def start(self):
+        if self.interval > 0:
+            threading.Thread(target=self._run, name='snapshot', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        self.write()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
@@ -0,0 +1,59 @@
+"""
+Offline stand-in for the requests module: answers geocoding, Open-Meteo
+daily/hourly forecasts and NASA POWER with fixed values.
+"""
+
+import json
+from datetime import datetime, timedelta
+
+NASA_PARAMETERS = ['T2M', 'T2M_MAX', 'T2M_MIN', 'PRECTOTCORR', 'RH2M', 'WS2M', 'ALLSKY_SFC_SW_DWN']
+
+
+class FakeResponse:
+    def __init__(self, url, payload):
+        self.url = url
+        self.status_code = 200
+        self.headers = {'Content-Type': 'application/json'}
+        self.content = json.dumps(payload).encode()
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeUpstream:
+    def __init__(self, start=datetime(2026, 3, 10)):
+        # First forecast day
+        self.start = start
+        self.calls = []
+
+    def get(self, url, params=None, timeout=None):
+        self.calls.append((url, dict(params or {})))
+        if 'geocoding' in url:
+            return FakeResponse(url, {'results': [{'latitude': 51.5, 'longitude': -0.1, 'name': 'London'}]})
+        if 'open-meteo' in url:
+            days = params['forecast_days']
+            if 'hourly' in params:
+                hours = [(self.start + timedelta(hours=i)).strftime('%Y-%m-%dT%H:%M') for i in range(days * 24)]
+                variables = {name: [float(i % 24) for i in range(len(hours))] for name in params['hourly'].split(',')}
+                return FakeResponse(url, {'timezone': 'Europe/London', 'hourly': {'time': hours, **variables}})
+            return FakeResponse(url, {'timezone': 'Europe/London', 'daily': {
+                'time': [(self.start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)],
+                'temperature_2m_max': [12.0] * days,
+                'temperature_2m_min': [5.0] * days,
+                'precipitation_sum': [1.0] * days,
+                'relative_humidity_2m_max': [80.0] * days,
+                'wind_speed_10m_max': [20.0] * days,
+                'uv_index_max': [3.0] * days
+            }})
+        start = datetime.strptime(str(params['start']), '%Y%m%d')
+        end = datetime.strptime(str(params['end']), '%Y%m%d')
+        parameter = {name: {} for name in NASA_PARAMETERS}
+        day = start
+        while day <= end:
+            for name in NASA_PARAMETERS:
+                parameter[name][day.strftime('%Y%m%d')] = 10.0
+            day += timedelta(days=1)
+        return FakeResponse(url, {'properties': {'parameter': parameter}})
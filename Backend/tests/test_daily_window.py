@@ -0,0 +1,127 @@
+"""
+Rolling NASA window: each day is downloaded once, only unpublished days are asked for again.
+Run from Backend/: python -m pytest tests
+"""
+
+import json
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import app
+from cache import MemoryCache
+from transport import ArchivedResponse
+
+NASA_PARAMETERS = ['T2M', 'T2M_MAX', 'T2M_MIN', 'PRECTOTCORR', 'RH2M', 'WS2M', 'ALLSKY_SFC_SW_DWN']
+
+
+class FakeNASA:
+    """Transport answering NASA POWER requests, days in `unpublished` come back as fill values"""
+    mode = 'fake'
+    rate_limited = False
+
+    def __init__(self):
+        self.requests = []
+        self.unpublished = set()
+
+    def get(self, url, params=None, timeout=None):
+        self.requests.append((params['start'], params['end']))
+        start = datetime.strptime(str(params['start']), '%Y%m%d')
+        end = datetime.strptime(str(params['end']), '%Y%m%d')
+        parameter = {name: {} for name in NASA_PARAMETERS}
+        day = start
+        while day <= end:
+            date = day.strftime('%Y%m%d')
+            for name in NASA_PARAMETERS:
+                parameter[name][date] = -999.0 if date in self.unpublished else 12.5
+            day += timedelta(days=1)
+        body = json.dumps({'properties': {'parameter': parameter}}).encode()
+        return ArchivedResponse(url, 200, {}, body)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.time() that tests move forward explicitly"""
+    now = [time.time()]
+    monkeypatch.setattr(app.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def nasa():
+    return FakeNASA()
+
+
+@pytest.fixture
+def service(nasa):
+    return app.EnhancedWeatherService(cache=MemoryCache(), transport=nasa)
+
+
+def forecast_window(today, days=7):
+    """The /forecast window: the `days` days ending today"""
+    return ((today - timedelta(days=days - 1)).strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d'))
+
+
+def test_consecutive_days_fetch_only_the_new_day(service, nasa, clock):
+    today = datetime(2026, 10, 19)
+    for offset in range(4):
+        start, end = forecast_window(today + timedelta(days=offset))
+        window = service.get_daily_window(51.5, -0.1, start, end)
+        assert len(window) == 7
+        clock[0] += 86400
+
+    assert nasa.requests == [
+        (20261013, 20261019),
+        (20261020, 20261020),
+        (20261021, 20261021),
+        (20261022, 20261022),
+    ]
+
+
+def test_repeat_request_is_served_from_the_window(service, nasa):
+    start, end = forecast_window(datetime(2026, 10, 19))
+    service.get_daily_window(51.5, -0.1, start, end)
+    service.get_daily_window(51.5, -0.1, start, end)
+    assert len(nasa.requests) == 1
+
+
+def test_unpublished_days_are_rechecked_after_the_delay(service, nasa, clock):
+    nasa.unpublished = {'20261018', '20261019'}
+    start, end = forecast_window(datetime(2026, 10, 19))
+
+    window = service.get_daily_window(51.5, -0.1, start, end)
+    assert [day.date for day in window] == ['20261013', '20261014', '20261015', '20261016', '20261017']
+
+    # Not asked again before the re-check delay
+    clock[0] += service.nasa_pending_recheck - 60
+    service.get_daily_window(51.5, -0.1, start, end)
+    assert len(nasa.requests) == 1
+
+    nasa.unpublished = set()
+    clock[0] += 120
+    window = service.get_daily_window(51.5, -0.1, start, end)
+    assert nasa.requests[-1] == (20261018, 20261019)
+    assert len(window) == 7
+
+
+def test_days_fetched_before_a_throttled_run_are_kept(service, nasa):
+    key = 'nasa-days:51.5000,-0.1000'
+    # A day held in the middle splits the missing days into two runs
+    held = {'day': app.DayRecord('20261016', 1, 2, 0, 0, 50, 3, 100, app.HISTORICAL_AIR_QUALITY).to_dict(),
+            'expires': time.time() + 3600}
+    service.cache.set(key, {'days': {'20261016': held}, 'recheck': {}})
+
+    get = nasa.get
+
+    def throttled_second_run(url, params=None, timeout=None):
+        if nasa.requests:
+            raise app.UpstreamThrottled('power.larc.nasa.gov', 'test')
+        return get(url, params, timeout)
+
+    nasa.get = throttled_second_run
+    start, end = forecast_window(datetime(2026, 10, 19))
+    with pytest.raises(app.UpstreamThrottled):
+        service.get_daily_window(51.5, -0.1, start, end)
+
+    assert sorted(service.cache.get(key)['days']) == ['20261013', '20261014', '20261015', '20261016']
@@ -0,0 +1,55 @@
+"""
+Prefetch warms what the routes read and never spends more than its cycle budget.
+Run from Backend/: python -m pytest tests
+"""
+
+import pytest
+
+import app
+from fake_upstream import FakeUpstream
+
+ROUTES = [
+    '/api/weather/enhanced?city=London',
+    '/api/weather/insights?city=London',
+    '/api/weather/forecast?city=London',
+    '/api/weather/hourly?city=London&days=3',
+    '/api/weather?city=London',
+]
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    for name in ('SNAPSHOT_PATH', 'CACHE_BACKEND', 'UPSTREAM_MODE', 'PREFETCH_ENABLED'):
+        monkeypatch.delenv(name, raising=False)
+    # Every route runs, the response cache must not answer
+    monkeypatch.setenv('RESPONSE_CACHE_TTL', '0')
+    monkeypatch.setenv('NASA_RATE_LIMIT', '1000')
+    monkeypatch.setenv('OPENMETEO_RATE_LIMIT', '1000')
+    fake = FakeUpstream()
+    monkeypatch.setattr(app, 'requests', fake)
+    return fake
+
+
+def test_prefetched_location_is_served_without_upstream_calls(upstream):
+    flask_app = app.create_app()
+    prefetcher = flask_app.extensions['weather_api']['prefetcher']
+    prefetcher.budget_per_cycle = 1000
+    prefetcher.tracker.record('London')
+    prefetcher.run_cycle()
+    assert prefetcher.last_cycle['locations_refreshed'] == ['london']
+
+    calls = len(upstream.calls)
+    client = flask_app.test_client()
+    for route in ROUTES:
+        assert client.get(route).status_code == 200, route
+    assert upstream.calls[calls:] == []
+
+
+@pytest.mark.parametrize('budget', [1, 2, 3, 5, 8])
+def test_cycle_stays_within_budget(upstream, budget):
+    prefetcher = app.create_app().extensions['weather_api']['prefetcher']
+    prefetcher.budget_per_cycle = budget
+    prefetcher.tracker.record('London')
+    prefetcher.tracker.record('Paris')
+    cycle = prefetcher.run_cycle()
+    assert cycle['upstream_calls'] == len(upstream.calls) == budget
@@ -0,0 +1,71 @@
+"""
+Record/replay: an archive recorded on one day replays on any later day.
+Run from Backend/: python -m pytest tests
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import app
+import transport
+from fake_upstream import FakeUpstream
+
+RECORDED = datetime(2026, 3, 10, 9, 30)
+
+
+class RecordingDay(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return RECORDED
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    """Archive recorded on RECORDED from a cold cache: /forecast and a default /enhanced"""
+    path = str(tmp_path / 'archive.sqlite3')
+    for name in ('SNAPSHOT_PATH', 'CACHE_BACKEND', 'UPSTREAM_REPLAY_NOW', 'PREFETCH_ENABLED'):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv('UPSTREAM_ARCHIVE', path)
+    monkeypatch.setenv('RESPONSE_CACHE_TTL', '0')
+    monkeypatch.setenv('NASA_RATE_LIMIT', '1000')
+
+    with monkeypatch.context() as recording:
+        recording.setattr(transport, 'datetime', RecordingDay)
+        recording.setattr(transport.time, 'time', lambda: RECORDED.timestamp())
+        recording.setattr(app, 'requests', FakeUpstream(RECORDED))
+        recording.setenv('UPSTREAM_MODE', 'record')
+        client = app.create_app().test_client()
+        assert client.get('/api/weather/forecast?city=London').status_code == 200
+        assert client.get('/api/weather/enhanced?city=London&days=3').status_code == 200
+
+    monkeypatch.setenv('UPSTREAM_MODE', 'replay')
+    return path
+
+
+def test_replay_on_a_later_day_uses_the_recording_clock(archive):
+    client = app.create_app().test_client()
+
+    forecast = client.get('/api/weather/forecast?city=London')
+    assert forecast.status_code == 200
+    assert forecast.get_json()['forecast'][-1]['date'] == RECORDED.strftime('%Y%m%d')
+
+    enhanced = client.get('/api/weather/enhanced?city=London&days=3').get_json()
+    assert enhanced['partial'] is False
+    assert enhanced['years_used'] == 10
+
+
+def test_replay_now_override(archive, monkeypatch):
+    monkeypatch.setenv('UPSTREAM_REPLAY_NOW', (RECORDED + timedelta(days=1)).isoformat())
+    response = app.create_app().test_client().get('/api/weather/forecast?city=London')
+    assert response.status_code == 502
+    assert 'not in replay archive' in response.get_json()['error']
+
+
+def test_years_missing_from_the_archive_make_the_answer_partial(archive):
+    client = app.create_app().test_client()
+    response = client.get('/api/weather/enhanced?city=London&days=3&date=2026-06-01')
+    assert response.status_code == 200
+    assert response.get_json()['partial'] is True
+    assert response.get_json()['years_used'] == 0
+    assert response.headers['Cache-Control'] == 'no-store'
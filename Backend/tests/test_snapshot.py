@@ -0,0 +1,46 @@
+"""
+Snapshot restore never replaces fresher cache entries.
+Run from Backend/: python -m pytest tests
+"""
+
+import time
+
+import pytest
+
+from cache import MemoryCache, SQLiteCache
+from startup import restore_snapshot, write_snapshot
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def cache(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryCache()
+    return SQLiteCache(str(tmp_path / 'cache.sqlite3'))
+
+
+def test_restore_keeps_fresher_entries(cache, tmp_path):
+    path = str(tmp_path / 'snapshot.json.gz')
+    cache.set('live:1', {'v': 'old'}, 600)
+    cache.set('geo:paris', {'v': 'paris'}, 600)
+    write_snapshot(cache, path)
+
+    cache.set('live:1', {'v': 'new'}, 1800)
+    cache.delete('geo:paris')
+
+    assert restore_snapshot(cache, path) == 1
+    assert cache.get('live:1') == {'v': 'new'}
+    assert cache.get('geo:paris') == {'v': 'paris'}
+
+
+def test_restore_skips_expired_entries(cache):
+    now = time.time()
+    added = cache.restore([('nasa:1', {'v': 1}, now - 5), ('nasa:2', {'v': 2}, now + 60)])
+    assert added == 1
+    assert cache.get('nasa:1') is None
+    assert cache.get('nasa:2') == {'v': 2}
+
+
+def test_restore_replaces_entries_expiring_sooner(cache):
+    cache.set('live:1', {'v': 'old'}, 60)
+    assert cache.restore([('live:1', {'v': 'snapshot'}, time.time() + 600)]) == 1
+    assert cache.get('live:1') == {'v': 'snapshot'}
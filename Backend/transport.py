@@ -0,0 +1,227 @@
+"""
+Upstream HTTP transports.
+passthrough talks to the network, record does the same and saves every
+request/response pair to an archive, replay serves responses from that archive
+without any network access (optionally with injected latency), so the service
+can be profiled, load-tested or run in an isolated environment.
+
+Responses are matched on the exact request, and several requests carry dates
+derived from "now" (forecast windows, default anchors, prefetch windows). A
+replay therefore runs with its clock pinned to the latest recording time, or to
+UPSTREAM_REPLAY_NOW. Which NASA ranges are requested also depends on what the
+cache already held, so replay from the same cache state the recording started
+from (usually cold: in-process cache, no snapshot). Requests that fall outside
+the recording raise ReplayMiss.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime
+
+from cache import SQLiteConnections
+
+MODES = ('passthrough', 'record', 'replay')
+
+
+class UpstreamHTTPError(Exception):
+    """Non-success status from an archived response"""
+
+
+class ReplayMiss(KeyError):
+    """The archive has no response for a request made in replay mode"""
+
+
+class ArchivedResponse:
+    """The parts of a requests.Response the service uses, rebuilt from the archive"""
+    __slots__ = ('url', 'status_code', 'headers', 'content')
+
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise UpstreamHTTPError(f"{self.status_code} for {self.url}")
+
+
+def request_key(url, params):
+    """Canonical archive key for a GET request, independent of parameter order"""
+    query = '&'.join(f"{name}={params[name]}" for name in sorted(params or {}))
+    return f"GET {url}?{query}"
+
+
+class ResponseArchive:
+    """Request/response pairs in one SQLite file, bodies zlib-compressed, keyed by request"""
+
+    def __init__(self, path):
+        self.path = path
+        self._connections = SQLiteConnections(path)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, status INTEGER NOT NULL, headers TEXT NOT NULL, '
+            'body BLOB NOT NULL, elapsed REAL NOT NULL, recorded_at REAL NOT NULL)'
+        )
+
+    def _connect(self):
+        return self._connections.get()
+
+    def save(self, key, status, headers, body, elapsed):
+        self._connect().execute(
+            'INSERT OR REPLACE INTO responses (key, status, headers, body, elapsed, recorded_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (key, status, json.dumps(headers), zlib.compress(body, 6), elapsed, time.time())
+        )
+
+    def load(self, key):
+        """(status, headers, body, elapsed) for a key, or None"""
+        row = self._connect().execute(
+            'SELECT status, headers, body, elapsed FROM responses WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        status, headers, body, elapsed = row
+        return status, json.loads(headers), zlib.decompress(body), elapsed
+
+    def count(self):
+        return self._connect().execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def last_recorded_at(self):
+        """Timestamp of the newest recorded response, None for an empty archive"""
+        return self._connect().execute('SELECT MAX(recorded_at) FROM responses').fetchone()[0]
+
+
+class PassthroughTransport:
+    mode = 'passthrough'
+    # Calls reach the real hosts, so they go through the upstream scheduler
+    rate_limited = True
+
+    def __init__(self, load_requests=None):
+        # load_requests lets the app defer (and time) the requests import
+        self._load_requests = load_requests
+        self._requests = None
+
+    def get(self, url, params=None, timeout=None):
+        if self._requests is None:
+            if self._load_requests is not None:
+                self._requests = self._load_requests()
+            else:
+                import requests
+                self._requests = requests
+        return self._requests.get(url, params=params, timeout=timeout)
+
+    def now(self):
+        return datetime.now()
+
+    def stats(self):
+        return {'mode': self.mode}
+
+
+class RecordingTransport(PassthroughTransport):
+    mode = 'record'
+    # Response headers the service reads, the rest is not worth archiving
+    kept_headers = ('Content-Type', 'Retry-After')
+
+    def __init__(self, archive, load_requests=None):
+        super().__init__(load_requests)
+        self.archive = archive
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def get(self, url, params=None, timeout=None):
+        started = time.perf_counter()
+        response = super().get(url, params=params, timeout=timeout)
+        elapsed = time.perf_counter() - started
+        headers = {name: response.headers[name] for name in self.kept_headers if name in response.headers}
+        try:
+            self.archive.save(request_key(url, params), response.status_code, headers,
+                              response.content, elapsed)
+            with self._lock:
+                self.recorded += 1
+        except sqlite3.Error as e:
+            print(f"Archive write error: {e}")
+        return response
+
+    def stats(self):
+        return {'mode': self.mode, 'archive': self.archive.path, 'recorded': self.recorded}
+
+
+class ReplayTransport:
+    mode = 'replay'
+    rate_limited = False
+
+    def __init__(self, archive, latency=None, clock=None):
+        # latency: None for none, a number of seconds, or 'recorded' to replay the original timing
+        self.archive = archive
+        self.latency = latency
+        # Dates in request parameters are computed from this fixed time, so they match the recording
+        if clock is None:
+            recorded_at = archive.last_recorded_at()
+            clock = datetime.fromtimestamp(recorded_at) if recorded_at else datetime.now()
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.lookup_seconds = 0.0
+
+    def get(self, url, params=None, timeout=None):
+        key = request_key(url, params)
+        started = time.perf_counter()
+        record = self.archive.load(key)
+        with self._lock:
+            self.lookup_seconds += time.perf_counter() - started
+            if record is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if record is None:
+            raise ReplayMiss(key)
+
+        status, headers, body, elapsed = record
+        if self.latency == 'recorded':
+            time.sleep(elapsed)
+        elif self.latency:
+            time.sleep(self.latency)
+        return ArchivedResponse(url, status, headers, body)
+
+    def now(self):
+        return self.clock
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'mode': self.mode,
+            'archive': self.archive.path,
+            'hits': self.hits,
+            'misses': self.misses,
+            'avg_lookup_ms': round(self.lookup_seconds / lookups * 1000, 4) if lookups else 0.0,
+            'latency': self.latency,
+            'clock': self.clock.isoformat(timespec='seconds')
+        }
+
+
+def create_transport(mode='passthrough', archive_path=None, latency=None, load_requests=None, replay_now=None):
+    """Build the upstream transport selected by configuration"""
+    mode = (mode or 'passthrough').lower()
+    if mode not in MODES:
+        raise ValueError(f"Unknown upstream mode: {mode}")
+    if mode == 'passthrough':
+        return PassthroughTransport(load_requests)
+
+    archive = ResponseArchive(archive_path or 'upstream_archive.sqlite3')
+    if mode == 'record':
+        return RecordingTransport(archive, load_requests)
+    if latency not in (None, '', 'recorded'):
+        latency = float(latency) / 1000  # configured in milliseconds
+    clock = datetime.fromisoformat(replay_now) if replay_now else None  # e.g. 2026-10-19 or 2026-10-19T12:00
+    return ReplayTransport(archive, latency or None, clock)
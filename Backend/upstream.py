@@ -0,0 +1,182 @@
+"""
+Rate-limit-aware scheduling for upstream API calls.
+Each host gets a token bucket; callers that find it empty wait in a bounded
+priority queue, so interactive requests are served before background prefetch
+and bulk export.
+"""
+
+import contextlib
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+
+# Priority classes, lower value is served first
+INTERACTIVE = 0
+PREFETCH = 1
+BULK = 2
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', PREFETCH: 'prefetch', BULK: 'bulk'}
+
+_current_priority = contextvars.ContextVar('upstream_priority', default=INTERACTIVE)
+
+
+class UpstreamThrottled(Exception):
+    """Raised when an upstream call cannot be scheduled or the host answered 429"""
+
+    def __init__(self, host, reason, retry_after=None):
+        super().__init__(f"{host}: {reason}")
+        self.host = host
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@contextlib.contextmanager
+def priority(level):
+    """Run upstream calls made inside the block with the given priority class"""
+    token = _current_priority.set(level)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority():
+    return _current_priority.get()
+
+
+class _HostQueue:
+    """Token bucket plus the priority queue of callers waiting on it"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.waiters = []
+        self.condition = threading.Condition()
+        self.stats = {
+            name: {'granted': 0, 'rejected': 0, 'timed_out': 0,
+                   'wait_seconds': 0.0, 'max_wait_seconds': 0.0}
+            for name in PRIORITY_NAMES.values()
+        }
+        self.throttled = 0
+
+    def refill(self, now):
+        if now < self.blocked_until:
+            # No budget accrues while the host is backing off after a 429
+            self.updated = now
+            return
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now):
+        """Seconds until a token becomes available"""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class UpstreamScheduler:
+    def __init__(self, default_rate=5.0, default_burst=10, limits=None,
+                 max_queue=64, timeouts=None):
+        # limits maps host -> (requests per second, burst size)
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self.limits = dict(limits or {})
+        # Background work may only use half of the queue so user requests always fit
+        self.max_queue = max_queue
+        self.timeouts = {INTERACTIVE: 10.0, PREFETCH: 30.0, BULK: 60.0}
+        self.timeouts.update(timeouts or {})
+        self._hosts = {}
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+
+    def _host(self, host):
+        with self._lock:
+            queue = self._hosts.get(host)
+            if queue is None:
+                rate, burst = self.limits.get(host, (self.default_rate, self.default_burst))
+                queue = self._hosts[host] = _HostQueue(rate, burst)
+            return queue
+
+    def acquire(self, host, level=None):
+        """Block until the host's budget allows one more call at this priority"""
+        level = current_priority() if level is None else level
+        name = PRIORITY_NAMES[level]
+        queue = self._host(host)
+        started = time.monotonic()
+        deadline = started + self.timeouts[level]
+
+        with queue.condition:
+            limit = self.max_queue if level == INTERACTIVE else self.max_queue // 2
+            if len(queue.waiters) >= limit:
+                queue.stats[name]['rejected'] += 1
+                raise UpstreamThrottled(host, 'upstream queue is full',
+                                        retry_after=max(1, int(queue.delay(started)) + 1))
+
+            entry = (level, next(self._sequence))
+            heapq.heappush(queue.waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    queue.refill(now)
+                    wait = queue.delay(now)
+                    if queue.waiters[0] == entry and wait == 0:
+                        queue.tokens -= 1
+                        break
+                    if now >= deadline:
+                        queue.stats[name]['timed_out'] += 1
+                        raise UpstreamThrottled(host, 'timed out waiting for upstream budget',
+                                                retry_after=max(1, int(wait) + 1))
+                    # Not our turn yet: sleep until the next token, woken early on changes
+                    queue.condition.wait(min(deadline - now, wait) if wait else deadline - now)
+            finally:
+                queue.waiters.remove(entry)
+                heapq.heapify(queue.waiters)
+                queue.condition.notify_all()
+
+            waited = time.monotonic() - started
+            stats = queue.stats[name]
+            stats['granted'] += 1
+            stats['wait_seconds'] += waited
+            stats['max_wait_seconds'] = max(stats['max_wait_seconds'], waited)
+
+    def penalize(self, host, retry_after=None):
+        """Pause a host after it answered 429, honouring Retry-After when given"""
+        queue = self._host(host)
+        with queue.condition:
+            queue.throttled += 1
+            queue.tokens = 0.0
+            queue.blocked_until = max(queue.blocked_until, time.monotonic() + (retry_after or 5))
+            queue.condition.notify_all()
+
+    def stats(self):
+        """Queue depth, wait times and rejections per host and priority class"""
+        with self._lock:
+            hosts = list(self._hosts.items())
+        result = {}
+        for host, queue in hosts:
+            with queue.condition:
+                depth = {name: 0 for name in PRIORITY_NAMES.values()}
+                for level, _ in queue.waiters:
+                    depth[PRIORITY_NAMES[level]] += 1
+                priorities = {}
+                for name, values in queue.stats.items():
+                    values = dict(values)
+                    values['avg_wait_seconds'] = (
+                        values['wait_seconds'] / values['granted'] if values['granted'] else 0.0
+                    )
+                    priorities[name] = values
+                result[host] = {
+                    'rate_per_second': queue.rate,
+                    'burst': queue.burst,
+                    'tokens': round(queue.tokens, 2),
+                    'queue_depth': depth,
+                    'throttled_429': queue.throttled,
+                    'priorities': priorities
+                }
+        return result